@@ -1,6 +1,11 @@
 # main.py
 import asyncio
-from main.ble_server import SafePiBLEServer
+import os
+import sys
+
+# ble_server imports its siblings (e.g. ble_protocol) the same way the runtime scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+from ble_server import SafePiBLEServer
 
 async def main():
     loop = asyncio.get_running_loop()
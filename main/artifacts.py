@@ -0,0 +1,175 @@
+import fcntl
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+# === Compiled model artifacts ===
+# Exporting or optimising a model takes tens of seconds on the Pi, so it should only happen once
+# per set of weights. The store keeps each result under
+#   artifacts/<weights stem>-<key><suffix>
+# where the key hashes the weights' contents together with everything that shapes the result
+# (format, input size, library versions, CPU architecture). Changing any of those builds a new
+# artifact next to the old ones; later starts with the same inputs load the file directly.
+#
+# Weight digests are remembered in artifacts/index.json by path, size and mtime, so a start does
+# not re-read 20 MB of weights just to find its artifact.
+#
+# Several processes may start at once (evaluate.py's workers, a restart racing a benchmark):
+# builds hold an flock on <artifact>.lock and re-check for the artifact once they have it, each
+# build writes to its own temporary file, and every file is moved into place with os.replace, so
+# readers only ever see complete files. An index that cannot be read is treated as empty.
+# ultralytics always exports next to the weights, so YOLO exports run on a copy of the weights in
+# a directory of their own; builds with different settings would otherwise share one output file.
+
+ARTIFACTS_DIR = "artifacts"
+YOLO_EXPORT_FORMATS = ("torchscript", "onnx")
+YOLO_EXPORT_SIZE = 640      # what ultralytics infers at when no input size is given
+YOLO_SUFFIXES = {"torchscript": ".torchscript", "onnx": ".onnx"}
+
+
+def _version(module_name):
+    try:
+        return __import__(module_name).__version__
+    except ImportError:
+        return None
+
+
+class ArtifactStore:
+    def __init__(self, root=ARTIFACTS_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def weights_hash(self, path):
+        stat = os.stat(path)
+        index = self._load_index()
+        entry = index.get(os.path.abspath(path))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        index[os.path.abspath(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                        "sha256": digest.hexdigest()}
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.temporary_path(self.index_path)
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+        return digest.hexdigest()
+
+    def path(self, weights, settings, suffix):
+        """Where the artifact for `weights` built with `settings` (a JSON-able dict) lives."""
+        key_source = json.dumps({"weights": self.weights_hash(weights), **settings}, sort_keys=True)
+        key = hashlib.sha256(key_source.encode()).hexdigest()[:16]
+        stem = os.path.splitext(os.path.basename(weights))[0]
+        return os.path.join(self.root, f"{stem}-{key}{suffix}")
+
+    def get(self, weights, settings, suffix, build):
+        """Path of the artifact, calling `build(tmp_path)` to create it the first time.
+
+        `build` writes the artifact to the path it is given; it is only moved into place once
+        complete, so an interrupted build is never mistaken for a finished one.
+        """
+        path = self.path(weights, settings, suffix)
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.root, exist_ok=True)
+        with _locked(path + ".lock"):
+            if os.path.exists(path):
+                return path     # another process built it while we waited
+            tmp_path = self.temporary_path(path)
+            print(f"Building {path} from {weights} (first start with these settings)...")
+            start = time.perf_counter()
+            try:
+                build(tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            meta_tmp = self.temporary_path(path + ".json")
+            with open(meta_tmp, "w") as f:
+                json.dump({"weights": weights, "settings": settings, "built": time.strftime("%Y-%m-%d %H:%M:%S"),
+                           "build_s": round(time.perf_counter() - start, 1)}, f, indent=1)
+            os.replace(meta_tmp, path + ".json")
+            print(f"Built {path} in {time.perf_counter() - start:.1f} s")
+        return path
+
+    def temporary_path(self, path):
+        """A fresh file in the store, unique to this process, with `path`'s extension.
+
+        The extension is kept because ONNX Runtime picks the format it writes from it.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+        os.close(fd)
+        return tmp_path
+
+
+@contextmanager
+def _locked(lock_path):
+    with open(lock_path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def yolo_export(weights, export_format, input_size=None, store=None):
+    """Path of `weights` exported by ultralytics to `export_format` at `input_size`.
+
+    Exports are fused and on the CPU in full precision: the Pi's CPU has no fast half-precision
+    path in PyTorch or ONNX Runtime, and ultralytics only exports half precision for GPUs.
+    """
+    from ultralytics import YOLO
+    if export_format not in YOLO_EXPORT_FORMATS:
+        raise ValueError(f"Unknown YOLO export format '{export_format}'; choose from {', '.join(YOLO_EXPORT_FORMATS)}")
+    if not os.path.exists(weights):
+        YOLO(weights)       # downloads the official weights into the working directory
+    store = store or ArtifactStore()
+    settings = {"kind": "yolo", "format": export_format, "imgsz": input_size or YOLO_EXPORT_SIZE,
+                "ultralytics": _version("ultralytics"), "torch": _version("torch"), "machine": platform.machine()}
+
+    def build(tmp_path):
+        kwargs = {"simplify": True} if export_format == "onnx" else {}
+        work_dir = tempfile.mkdtemp(dir=store.root, prefix=".export-")
+        try:
+            work_weights = shutil.copy2(weights, work_dir)
+            exported = YOLO(work_weights).export(format=export_format, imgsz=settings["imgsz"], device="cpu", **kwargs)
+            shutil.move(exported, tmp_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return store.get(weights, settings, YOLO_SUFFIXES[export_format], build)
+
+
+def ort_optimized(model_path, store=None):
+    """Path of `model_path` with every ONNX Runtime graph optimisation applied.
+
+    Load it with optimisations disabled. The optimised graph can hold layouts specific to this
+    CPU, hence the architecture and ONNX Runtime version in the key.
+    """
+    import onnxruntime as ort
+    store = store or ArtifactStore()
+    settings = {"kind": "ort-optimized", "level": "all", "onnxruntime": ort.__version__,
+                "machine": platform.machine()}
+
+    def build(tmp_path):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.optimized_model_filepath = tmp_path
+        ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+    return store.get(model_path, settings, ".ort.onnx", build)
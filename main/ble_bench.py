@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import ble_fake
+import ble_server
+import stats
+
+# === BLE announcement benchmark ===
+# Drives SafePiBLEServer against ble_fake.FakeBlessServer at increasing message rates and reports
+# send jitter (time from when a message is due to when update_value() records it) and whether
+# each rate could be sustained. update_value() is synchronous in the fake, so this is how late
+# the event loop gets to each send, not the over-the-air latency a phone would see; that has to
+# be measured on the client. Runs on any Linux machine, no adapter required.
+#
+#   python ble_bench.py --protocol binary --rates 10,50,100,500,1000 --duration 3
+
+SAMPLE_OBJECTS = [
+    {"label": "person", "distance_cm": 180.0, "bearing_deg": -12.0},
+    {"label": "bicycle", "distance_cm": 340.0, "bearing_deg": 20.0},
+    {"label": "car", "distance_cm": 620.0, "bearing_deg": 3.0},
+    {"label": "crosswalk", "distance_cm": 700.0, "bearing_deg": 0.0},
+    {"label": "obstacle", "distance_cm": 90.0, "bearing_deg": -30.0},
+]
+
+# A rate counts as sustained when the achieved rate is within 5% of the target and the sends are
+# not falling further behind: the median lateness of the last quarter of a run may exceed that of
+# the first quarter by at most BACKLOG_BUDGET_MS. Single slow sends (a GC pause, a context switch)
+# show up in p99 and max but do not decide the verdict. p99 is only printed with at least
+# MIN_P99_SAMPLES sends behind it.
+MIN_ACHIEVED = 0.95
+BACKLOG_BUDGET_MS = 5.0
+MIN_P99_SAMPLES = 100
+
+
+async def make_server(protocol: str, mtu: int):
+    server = ble_server.SafePiBLEServer(asyncio.get_running_loop(), server_factory=ble_fake.FakeBlessServer)
+    await server.start()
+    if protocol == "binary":
+        server.server.simulate_write(server.char_uuid, f"proto:1:{mtu}".encode())
+    server.server.updates.clear()
+    return server
+
+
+async def send_one(server, protocol: str, i: int):
+    if protocol == "binary":
+        await server.send_hazards(SAMPLE_OBJECTS)
+    else:
+        await server.send_message(f"person to the left, {1 + i % 50 / 10:.1f} meters away")
+
+
+async def run_rate(protocol: str, rate: float, duration: float, mtu: int):
+    """Send at a fixed rate for `duration` seconds; return (achieved rate, send jitter in ms)."""
+    server = await make_server(protocol, mtu)
+    period = 1.0 / rate
+    count = int(rate * duration)
+    due_times = []
+    start = time.perf_counter()
+    for i in range(count):
+        due = start + i * period
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        due_times.append(due)
+        await send_one(server, protocol, i)
+    # `count` messages occupy `count` periods: the window ends when the next one would be due,
+    # or later if the sends fell behind
+    elapsed = max(time.perf_counter() - start, count * period)
+    await server.stop()
+
+    notify_times = [t for t, _, _ in server.server.updates]
+    jitter = [(n - d) * 1000 for d, n in zip(due_times, notify_times)]
+    return len(notify_times) / elapsed, jitter
+
+
+async def run_flood(protocol: str, count: int, mtu: int):
+    """Send back-to-back to find the ceiling of the announcement path."""
+    server = await make_server(protocol, mtu)
+    start = time.perf_counter()
+    for i in range(count):
+        await send_one(server, protocol, i)
+    elapsed = time.perf_counter() - start
+    await server.stop()
+    return count / elapsed
+
+
+def backlog_growth_ms(jitter):
+    """How much later the last quarter's sends ran than the first quarter's (median, ms)."""
+    quarter = max(1, len(jitter) // 4)
+    return statistics.median(jitter[-quarter:]) - statistics.median(jitter[:quarter])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Safe-Step BLE announcement path")
+    parser.add_argument("--protocol", choices=["text", "binary"], default="binary")
+    parser.add_argument("--rates", default="10,50,100,500,1000", help="comma-separated messages/s")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per rate")
+    parser.add_argument("--mtu", type=int, default=23)
+    parser.add_argument("--flood", type=int, default=5000, help="messages for the back-to-back run")
+    parser.add_argument("--log-level", default="WARNING",
+                        help="ble_server logging level (the runtime default is INFO)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    print(f"Protocol: {args.protocol}, MTU {args.mtu}, log level {args.log_level}")
+    print("Jitter: how late each send ran after it was due (event-loop scheduling, not radio latency)")
+    print(f"{'target/s':>9} {'achieved/s':>11} {'jitter p50 ms':>14} {'p99 ms':>8} {'max ms':>8} "
+          f"{'backlog ms':>11}  sustained")
+    max_sustained = 0.0
+    for rate in [float(r) for r in args.rates.split(",")]:
+        achieved, jitter = await run_rate(args.protocol, rate, args.duration, args.mtu)
+        p50 = statistics.median(jitter)
+        p99 = f"{stats.percentile(jitter, 99):8.3f}" if len(jitter) >= MIN_P99_SAMPLES else f"{'-':>8}"
+        backlog = backlog_growth_ms(jitter)
+        sustained = achieved >= MIN_ACHIEVED * rate and backlog <= BACKLOG_BUDGET_MS
+        if sustained:
+            max_sustained = max(max_sustained, rate)
+        print(f"{rate:9.0f} {achieved:11.1f} {p50:14.3f} {p99} {max(jitter):8.3f} {backlog:11.3f}  "
+              f"{'yes' if sustained else 'no'}")
+
+    ceiling = await run_flood(args.protocol, args.flood, args.mtu)
+    print(f"\nMax sustained scheduled rate: {max_sustained:.0f} msg/s")
+    print(f"Back-to-back ceiling: {ceiling:.0f} msg/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+# === Local stand-in for bless.BlessServer ===
+# Implements just the part of the BlessServer interface that SafePiBLEServer uses, without
+# BlueZ or a phone. Every update_value() call is recorded with a perf_counter() timestamp so
+# benchmarks can measure how long the announcement path takes.
+
+
+class FakeCharacteristic:
+    def __init__(self, uuid: str, properties, value: Optional[bytearray], permissions):
+        self.uuid = uuid
+        self.properties = properties
+        self.permissions = permissions
+        self.value = value if value is not None else bytearray()
+
+
+class FakeBlessServer:
+    def __init__(self, name: str, loop: Optional[asyncio.AbstractEventLoop] = None, **kwargs):
+        self.name = name
+        self.loop = loop
+        self.read_request_func = None
+        self.write_request_func = None
+        self.services: Dict[str, List[str]] = {}
+        self.characteristics: Dict[str, FakeCharacteristic] = {}
+        self.updates: List[Tuple[float, str, bytes]] = []  # (perf_counter, char uuid, value)
+        self.advertising = False
+
+    async def add_new_service(self, service_uuid: str):
+        self.services.setdefault(service_uuid.lower(), [])
+
+    async def add_new_characteristic(self, service_uuid: str, char_uuid: str, properties, value,
+                                     permissions):
+        self.services[service_uuid.lower()].append(char_uuid.lower())
+        self.characteristics[char_uuid.lower()] = FakeCharacteristic(char_uuid, properties, value,
+                                                                     permissions)
+
+    def get_characteristic(self, char_uuid: str) -> Optional[FakeCharacteristic]:
+        return self.characteristics.get(char_uuid.lower())
+
+    async def start(self, **kwargs) -> bool:
+        self.advertising = True
+        return True
+
+    async def stop(self) -> bool:
+        self.advertising = False
+        return True
+
+    async def is_connected(self) -> bool:
+        return self.advertising
+
+    def update_value(self, service_uuid: str, char_uuid: str) -> bool:
+        characteristic = self.get_characteristic(char_uuid)
+        if characteristic is None:
+            return False
+        self.updates.append((time.perf_counter(), char_uuid.lower(), bytes(characteristic.value)))
+        return True
+
+    def simulate_write(self, char_uuid: str, value: bytes):
+        """Deliver a client write the way bless does, through write_request_func."""
+        characteristic = self.get_characteristic(char_uuid)
+        characteristic.value = bytearray(value)
+        self.write_request_func(characteristic, bytearray(value))
+
+    def simulate_read(self, char_uuid: str) -> bytearray:
+        return self.read_request_func(self.get_characteristic(char_uuid))
@@ -0,0 +1,118 @@
+import struct
+from typing import List, Optional, Sequence
+
+# === Safe-Step notification protocol ===
+# Version 0 is the original free-form UTF-8 sentence ("person to the left, 2.3 meters away").
+# Version 1 packs the nearest objects into one notification:
+#
+#   header  : magic 'S' (u8), version (u8), sequence (u8), object count (u8)
+#   object  : class id (u8), urgency (u8), distance in cm (u16 LE), bearing in degrees (i8)
+#
+# Bearing is 0 straight ahead, negative to the left, positive to the right.
+# Clients opt in by writing "proto:1" (optionally "proto:1:<mtu>") to the characteristic;
+# anything else keeps the text format so older apps continue to work.
+
+PROTOCOL_TEXT = 0
+PROTOCOL_BINARY_V1 = 1
+SUPPORTED_VERSIONS = (PROTOCOL_TEXT, PROTOCOL_BINARY_V1)
+
+MAGIC = 0x53  # 'S'
+HEADER = struct.Struct("<BBBB")
+OBJECT = struct.Struct("<BBHb")
+
+DEFAULT_ATT_MTU = 23   # BLE 4.0 minimum; 3 bytes go to the ATT header
+ATT_HEADER_SIZE = 3
+MAX_DISTANCE_CM = 0xFFFF
+
+# Urgency levels (higher is more urgent), keyed by distance in cm
+URGENCY_NONE, URGENCY_LOW, URGENCY_HIGH, URGENCY_IMMINENT = 0, 1, 2, 3
+URGENCY_BANDS_CM = ((100, URGENCY_IMMINENT), (250, URGENCY_HIGH), (500, URGENCY_LOW))
+
+# Class ids 0-79 follow the COCO order used by the YOLO models; the rest are Safe-Step specific
+COCO_LABELS = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog",
+    "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball", "kite",
+    "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch", "potted plant",
+    "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors",
+    "teddy bear", "hair drier", "toothbrush",
+)
+CLASS_CROSSWALK = 200
+CLASS_OBSTACLE = 201
+CLASS_UNKNOWN = 255
+
+CLASS_IDS = {label: i for i, label in enumerate(COCO_LABELS)}
+CLASS_IDS["crosswalk"] = CLASS_CROSSWALK
+CLASS_IDS["obstacle"] = CLASS_OBSTACLE
+
+
+def class_id(label: str) -> int:
+    return CLASS_IDS.get(label.lower(), CLASS_UNKNOWN)
+
+
+def label_for(cls: int) -> str:
+    """Inverse of class_id."""
+    if cls < len(COCO_LABELS):
+        return COCO_LABELS[cls]
+    return {CLASS_CROSSWALK: "crosswalk", CLASS_OBSTACLE: "obstacle"}.get(cls, "unknown")
+
+
+def urgency_for(distance_cm: float) -> int:
+    for limit_cm, urgency in URGENCY_BANDS_CM:
+        if distance_cm < limit_cm:
+            return urgency
+    return URGENCY_NONE
+
+
+def max_objects(mtu: int = DEFAULT_ATT_MTU) -> int:
+    """Number of objects that fit in one notification for the given ATT MTU."""
+    payload = mtu - ATT_HEADER_SIZE - HEADER.size
+    return max(0, min(255, payload // OBJECT.size))
+
+
+def parse_negotiation(message: str) -> Optional[tuple]:
+    """Parse a "proto:<version>[:<mtu>]" write. Returns (version, mtu) or None."""
+    parts = message.strip().lower().split(":")
+    if len(parts) not in (2, 3) or parts[0] != "proto":
+        return None
+    try:
+        version = int(parts[1])
+        mtu = int(parts[2]) if len(parts) == 3 else DEFAULT_ATT_MTU
+    except ValueError:
+        return None
+    if version not in SUPPORTED_VERSIONS:
+        version = PROTOCOL_TEXT
+    return version, max(DEFAULT_ATT_MTU, mtu)
+
+
+def pack_hazards(objects: Sequence[dict], seq: int, mtu: int = DEFAULT_ATT_MTU) -> bytes:
+    """Pack the nearest objects (sorted by distance) into one version 1 payload.
+
+    Each object is a detection dict with "label" and "distance_cm", and optionally
+    "bearing_deg" and "urgency".
+    """
+    chosen = list(objects)[:max_objects(mtu)]
+    body = []
+    for obj in chosen:
+        distance_cm = int(min(max(obj["distance_cm"], 0), MAX_DISTANCE_CM))
+        bearing = int(round(max(-127, min(127, obj.get("bearing_deg", 0.0)))))
+        urgency = obj.get("urgency", urgency_for(obj["distance_cm"]))
+        body.append(OBJECT.pack(class_id(obj["label"]), urgency, distance_cm, bearing))
+    return HEADER.pack(MAGIC, PROTOCOL_BINARY_V1, seq & 0xFF, len(chosen)) + b"".join(body)
+
+
+def unpack_hazards(payload: bytes) -> List[dict]:
+    """Inverse of pack_hazards, for clients and tests."""
+    magic, version, _seq, count = HEADER.unpack_from(payload, 0)
+    if magic != MAGIC or version != PROTOCOL_BINARY_V1:
+        raise ValueError(f"Not a Safe-Step v1 payload (magic={magic:#x}, version={version})")
+    objects = []
+    for i in range(count):
+        cls, urgency, distance_cm, bearing = OBJECT.unpack_from(payload, HEADER.size + i * OBJECT.size)
+        objects.append({"label": label_for(cls), "urgency": urgency, "distance_cm": distance_cm,
+                        "bearing_deg": bearing})
+    return objects
@@ -1,5 +1,4 @@
 
-import subprocess
 import sys
 import asyncio
 import threading
@@ -11,18 +10,20 @@ from bless import (
     GATTCharacteristicProperties,
     GATTAttributePermissions,
 )
+import ble_protocol
+import commands
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 callback = None
 
 class SafePiBLEServer:
-    def __init__(self, loop: asyncio.AbstractEventLoop):
+    def __init__(self, loop: asyncio.AbstractEventLoop, server_factory=BlessServer):
+        # server_factory lets benchmarks swap in ble_fake.FakeBlessServer for the BlueZ-backed server
         self.loop = loop
         self.trigger: Union[asyncio.Event, threading.Event]
         self.trigger = threading.Event() if sys.platform in ["darwin", "win32"] else asyncio.Event()
 
-        self.server = BlessServer(name="Safe-Step", loop=loop)
+        self.server = server_factory(name="Safe-Step", loop=loop)
         self.server.read_request_func = self.read_request
         self.server.write_request_func = self.write_request
 
@@ -30,6 +31,16 @@ class SafePiBLEServer:
         self.char_uuid = "3A98B215-2971-4C6D-B5C2-02597AE99D0E"
         self.characteristic: Optional[BlessGATTCharacteristic] = None
 
+        # Negotiated notification format (see ble_protocol); text until the client asks otherwise
+        self.protocol_version = ble_protocol.PROTOCOL_TEXT
+        self.mtu = ble_protocol.DEFAULT_ATT_MTU
+        self.sequence = 0
+
+        # Writes are parsed into typed commands and handled on the loop, never inside the callback
+        self.commands = commands.CommandDispatcher(loop)
+        self.commands.register(commands.Shutdown, commands.shutdown_device)
+        self.dispatch_task: Optional[asyncio.Task] = None
+
     async def start(self):
         await self.server.add_new_service(self.service_uuid)
 
@@ -49,10 +60,13 @@ class SafePiBLEServer:
         )
 
         self.characteristic = self.server.get_characteristic(self.char_uuid)
+        self.dispatch_task = asyncio.create_task(self.commands.run())
         await self.server.start()
         logger.info("BLE server started and advertising.")
 
     async def stop(self):
+        if self.dispatch_task:
+            self.dispatch_task.cancel()
         await self.server.stop()
         logger.info("BLE server stopped.")
 
@@ -61,13 +75,19 @@ class SafePiBLEServer:
         return characteristic.value
 
     def write_request(self, characteristic: BlessGATTCharacteristic, value: bytearray, **kwargs):
-        message = value.decode('utf-8')
+        message = value.decode('utf-8', errors='replace')
         logger.info(f">>>> write_request triggered!")
         logger.info(f"Received from client: {message}")
-        
-        if(message == "shutdown"):
-            subprocess.run(["sudo", "shutdown", "now"])
-        
+
+        negotiation = ble_protocol.parse_negotiation(message)
+        if negotiation:
+            self.protocol_version, self.mtu = negotiation
+            logger.info(f"Client negotiated protocol v{self.protocol_version} (MTU {self.mtu})")
+
+        command = commands.parse_command(message)
+        if command:
+            self.commands.submit(command)
+
         self.characteristic.value = value
         logger.info(f"Updated value to ${message}")
         
@@ -85,3 +105,16 @@ class SafePiBLEServer:
             logger.info(f"Sent to client: {msg}")
         else:
             logger.warning("No client connected; message not sent.")
+
+    async def send_hazards(self, objects):
+        """Send the nearest objects as one packed notification (protocol v1 clients only)."""
+        if not self.characteristic:
+            logger.warning("No client connected; hazards not sent.")
+            return
+        payload = ble_protocol.pack_hazards(objects, self.sequence, self.mtu)
+        self.sequence = (self.sequence + 1) & 0xFF
+        self.characteristic.value = bytearray(payload)
+        self.server.update_value(self.service_uuid, self.char_uuid)
+
+        await asyncio.sleep(0)
+        logger.debug(f"Sent {len(payload)} byte hazard list to client")
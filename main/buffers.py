@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+# === Per-frame buffers ===
+# The loop used to allocate a dozen full-frame arrays per iteration (captures, RGB copy, remaps,
+# grays, disparity and its float conversion, visualisation). A FramePool hands out the same
+# named arrays every frame instead, for OpenCV calls to fill through their `dst=` argument.
+# Frames are processed one at a time, so a buffer is only rewritten after everything that read
+# it in the previous frame is done; anything that must outlive the frame has to copy.
+
+
+class FramePool:
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        """The array called `name`, reallocated only when the requested shape or dtype changes."""
+        shape = tuple(shape)
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.buffers[name] = np.empty(shape, dtype)
+        return buffer
+
+    def clear(self):
+        self.buffers.clear()
+
+
+@contextmanager
+def captured_pair(cameras, stream="main"):
+    """Map the next request buffer of both cameras without copying.
+
+    Yields (left, right) views into the camera's own buffers; they are only valid inside the
+    `with` block, after which the requests go back to libcamera.
+    """
+    from picamera2 import MappedArray
+
+    requests = [camera.capture_request() for camera in cameras]
+    try:
+        with MappedArray(requests[0], stream) as left, MappedArray(requests[1], stream) as right:
+            yield left.array, right.array
+    finally:
+        for request in requests:
+            request.release()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+# === Versioned calibration bundle ===
+# Everything the runtime needs for one resolution, precomputed by calibration.py:
+#
+#   stereo_bundle_<w>x<h>/meta.json   version, resolution, valid ROIs, source calibration (with
+#                                     its sha256 and mtime, so a bundle left over from an older
+#                                     calibration is refused)
+#   stereo_bundle_<w>x<h>/<name>.npy  R1 R2 P1 P2 Q and fixed-point rectification maps
+#                                     (mapL1/mapR1 CV_16SC2, mapL2/mapR2 CV_16UC1)
+#
+# Arrays are plain uncompressed .npy files so they are memory-mapped on load instead of read
+# and decoded. The intrinsics are scaled from the resolution the calibration pairs were captured
+# at, which calibration.py stores in the .npz as img_size.
+
+BUNDLE_VERSION = 3
+CALIB_PATH = "stereo_calib_data.npz"
+LEGACY_CALIB_SIZE = (640, 480)  # capture resolution of calibrations saved without img_size
+
+ARRAYS = ("R1", "R2", "P1", "P2", "Q", "mapL1", "mapL2", "mapR1", "mapR2")
+
+
+def bundle_path(size, root="."):
+    return os.path.join(root, f"stereo_bundle_{size[0]}x{size[1]}")
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_bundle(size, calib_path=CALIB_PATH):
+    """Compute the bundle for `size` from raw intrinsics/extrinsics, scaling from the calibration resolution."""
+    calib = np.load(calib_path)
+    calib_size = tuple(int(v) for v in calib["img_size"]) if "img_size" in calib else LEGACY_CALIB_SIZE
+    scale = np.diag([size[0] / calib_size[0], size[1] / calib_size[1], 1.0])
+    mtxL, mtxR = scale @ calib['mtxL'], scale @ calib['mtxR']
+    distL, distR = calib['distL'], calib['distR']
+    R1, R2, P1, P2, Q, roiL, roiR = cv2.stereoRectify(mtxL, distL, mtxR, distR, size, calib['R'], calib['T'])
+    mapL1, mapL2 = cv2.initUndistortRectifyMap(mtxL, distL, R1, P1, size, cv2.CV_16SC2)
+    mapR1, mapR2 = cv2.initUndistortRectifyMap(mtxR, distR, R2, P2, size, cv2.CV_16SC2)
+    return {
+        "version": BUNDLE_VERSION, "size": tuple(size), "roiL": tuple(roiL), "roiR": tuple(roiR),
+        "source": os.path.basename(calib_path),
+        "source_sha256": file_sha256(calib_path), "source_mtime": os.path.getmtime(calib_path),
+        "R1": R1, "R2": R2, "P1": P1, "P2": P2, "Q": Q,
+        "mapL1": mapL1, "mapL2": mapL2, "mapR1": mapR1, "mapR2": mapR2,
+    }
+
+
+def save_bundle(bundle, path):
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(bundle[name]))
+    meta = {"version": bundle["version"], "resolution": list(bundle["size"]),
+            "roiL": list(bundle["roiL"]), "roiR": list(bundle["roiR"]), "source": bundle["source"],
+            "source_sha256": bundle["source_sha256"], "source_mtime": bundle["source_mtime"]}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_bundle(path, expected_size, calib_path=CALIB_PATH):
+    """Memory-map a bundle.
+
+    Raises ValueError on a version or resolution mismatch, or when it was not built from the
+    current `calib_path`.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != BUNDLE_VERSION:
+        raise ValueError(f"{path}: bundle version {meta['version']}, expected {BUNDLE_VERSION}; re-run calibration.py")
+    if tuple(meta["resolution"]) != tuple(expected_size):
+        raise ValueError(f"{path}: bundle is for {meta['resolution'][0]}x{meta['resolution'][1]}, "
+                         f"cameras run at {expected_size[0]}x{expected_size[1]}")
+    # Same mtime: same file; otherwise only the contents decide (a copy or touch is harmless)
+    if os.path.getmtime(calib_path) != meta["source_mtime"] and file_sha256(calib_path) != meta["source_sha256"]:
+        raise ValueError(f"{path}: bundle was built from a different {os.path.basename(calib_path)} "
+                         f"(recalibrated since); re-run calibration.py")
+    bundle = {"version": meta["version"], "size": tuple(meta["resolution"]),
+              "roiL": tuple(meta["roiL"]), "roiR": tuple(meta["roiR"]), "source": meta["source"],
+              "source_sha256": meta["source_sha256"], "source_mtime": meta["source_mtime"]}
+    for name in ARRAYS:
+        bundle[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+    return bundle
@@ -1,65 +1,168 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
 import cv2
 import numpy as np
-import glob
+
+import calib_bundle
+import profiles
 
 # Calibration settings
 board_size = (10, 7)
 square_size = 0.016  # meters
 
-# Prepare object points
-objp = np.zeros((board_size[0] * board_size[1], 3), np.float32)
-objp[:, :2] = np.mgrid[0:board_size[0], 0:board_size[1]].T.reshape(-1, 2)
-objp *= square_size
+# Corner detection runs on a downscaled copy first, then is refined at full resolution
+DETECT_SCALE = 0.5
+SUBPIX_WINDOW = (11, 11)
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+CACHE_PATH = "corner_cache.json"
+
+# Pairs whose stereo reprojection error exceeds both of these are dropped and calibration re-run
+MAX_PAIR_ERROR_PX = 1.0
+MAX_PAIR_ERROR_RATIO = 2.5  # times the median pair error
+
+
+def image_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def cache_key(digest):
+    return f"{digest}:{board_size[0]}x{board_size[1]}"
+
+
+def find_corners(path):
+    """Detect and refine chessboard corners in one image. Returns (path, entry) for the cache."""
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE
+    small = cv2.resize(gray, None, fx=DETECT_SCALE, fy=DETECT_SCALE, interpolation=cv2.INTER_AREA)
+    found, corners = cv2.findChessboardCorners(small, board_size, flags | cv2.CALIB_CB_FAST_CHECK)
+    if found:
+        corners = corners / DETECT_SCALE
+    else:
+        # The downscaled board can be too small to find; try once more at full resolution
+        found, corners = cv2.findChessboardCorners(gray, board_size, flags)
+
+    entry = {"found": bool(found), "size": [gray.shape[1], gray.shape[0]], "corners": None}
+    if found:
+        corners = cv2.cornerSubPix(gray, corners.astype(np.float32), SUBPIX_WINDOW, (-1, -1), SUBPIX_CRITERIA)
+        entry["corners"] = corners.reshape(-1, 2).tolist()
+    return path, entry
+
+
+def load_cache():
+    if os.path.exists(CACHE_PATH):
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    return {}
+
+
+def detect_all(paths, workers):
+    """Corners for every path, reusing cached results and detecting the rest in parallel."""
+    cache = load_cache()
+    digests = {path: image_hash(path) for path in paths}
+    todo = [path for path in paths if cache_key(digests[path]) not in cache]
+    print(f"{len(paths) - len(todo)} images cached, detecting corners in {len(todo)} on {workers} workers...")
+    if todo:
+        with Pool(workers) as pool:
+            for path, entry in pool.imap_unordered(find_corners, todo):
+                cache[cache_key(digests[path])] = entry
+        with open(CACHE_PATH, "w") as f:
+            json.dump(cache, f)
+    return {path: cache[cache_key(digests[path])] for path in paths}
+
+
+def stereo_calibrate(objpoints, imgpointsL, imgpointsR, img_size):
+    # Calibrate individual cameras
+    retL, mtxL, distL, _, _ = cv2.calibrateCamera(objpoints, imgpointsL, img_size, None, None)
+    retR, mtxR, distR, _, _ = cv2.calibrateCamera(objpoints, imgpointsR, img_size, None, None)
+
+    # Stereo calibration
+    flags = cv2.CALIB_FIX_INTRINSIC
+    criteria = (cv2.TermCriteria_MAX_ITER + cv2.TermCriteria_EPS, 100, 1e-5)
+    R = np.eye(3)
+    T = np.zeros((3, 1))
+    outputs = cv2.stereoCalibrateExtended(
+        objpoints, imgpointsL, imgpointsR,
+        mtxL, distL,
+        mtxR, distR,
+        img_size, R, T,
+        criteria=criteria,
+        flags=flags
+    )
+    # Newer OpenCV versions also return rvecs/tvecs; per-view errors are always last
+    retStereo, mtxL, distL, mtxR, distR, R, T, E, F = outputs[:9]
+    per_view = outputs[-1]
+    return retStereo, (mtxL, distL, mtxR, distR, R, T, E, F), per_view.max(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stereo calibration from left/right chessboard pairs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--keep-all", action="store_true", help="do not drop pairs with high reprojection error")
+    parser.add_argument("--bundle-sizes", default=None,
+                        help="comma-separated WxH bundles to emit, default the calibration size and every profile resolution")
+    args = parser.parse_args()
 
-# Arrays to store points
-objpoints = []
-imgpointsL = []
-imgpointsR = []
+    # Prepare object points
+    objp = np.zeros((board_size[0] * board_size[1], 3), np.float32)
+    objp[:, :2] = np.mgrid[0:board_size[0], 0:board_size[1]].T.reshape(-1, 2)
+    objp *= square_size
 
-images_left = sorted(glob.glob("left/*.jpg"))
-images_right = sorted(glob.glob("right/*.jpg"))
+    images_left = sorted(glob.glob("left/*.jpg") + glob.glob("left/*.png"))
+    images_right = sorted(glob.glob("right/*.jpg") + glob.glob("right/*.png"))
+    pairs = list(zip(images_left, images_right))
 
-img_size = None
+    corners = detect_all([p for pair in pairs for p in pair], args.workers)
+    usable = [(l, r) for l, r in pairs if corners[l]["found"] and corners[r]["found"]]
+    print(f"Chessboard found in both images of {len(usable)}/{len(pairs)} pairs.")
+    if not usable:
+        raise SystemExit("No usable calibration pairs: the chessboard was not found in both images of any "
+                         "pair in left/ and right/. Check the board size and retake the pictures.")
+    img_size = tuple(corners[usable[0][0]]["size"])
 
-for imgL_path, imgR_path in zip(images_left, images_right):
-    imgL = cv2.imread(imgL_path)
-    imgR = cv2.imread(imgR_path)
+    def points(pairs_subset):
+        return ([objp] * len(pairs_subset),
+                [np.array(corners[l]["corners"], np.float32).reshape(-1, 1, 2) for l, _ in pairs_subset],
+                [np.array(corners[r]["corners"], np.float32).reshape(-1, 1, 2) for _, r in pairs_subset])
 
-    grayL = cv2.cvtColor(imgL, cv2.COLOR_BGR2GRAY)
-    grayR = cv2.cvtColor(imgR, cv2.COLOR_BGR2GRAY)
+    retStereo, result, errors = stereo_calibrate(*points(usable), img_size)
+    print(f"Stereo RMS reprojection error: {retStereo:.3f} px")
 
-    if img_size is None:
-        img_size = grayL.shape[::-1]  # (width, height)
+    limit = max(MAX_PAIR_ERROR_PX, MAX_PAIR_ERROR_RATIO * float(np.median(errors)))
+    for (l, r), error in sorted(zip(usable, errors), key=lambda item: -item[1]):
+        print(f"  {os.path.basename(l)} / {os.path.basename(r)}: {error:.3f} px{'  (dropped)' if error > limit and not args.keep_all else ''}")
 
-    retL, cornersL = cv2.findChessboardCorners(grayL, board_size, None)
-    retR, cornersR = cv2.findChessboardCorners(grayR, board_size, None)
+    if not args.keep_all and np.any(errors > limit):
+        usable = [pair for pair, error in zip(usable, errors) if error <= limit]
+        retStereo, result, errors = stereo_calibrate(*points(usable), img_size)
+        print(f"Recalibrated with {len(usable)} pairs: RMS {retStereo:.3f} px")
 
-    if retL and retR:
-        objpoints.append(objp)
-        imgpointsL.append(cornersL)
-        imgpointsR.append(cornersR)
+    mtxL, distL, mtxR, distR, R, T, E, F = result
 
-# Calibrate individual cameras
-retL, mtxL, distL, _, _ = cv2.calibrateCamera(objpoints, imgpointsL, img_size, None, None)
-retR, mtxR, distR, _, _ = cv2.calibrateCamera(objpoints, imgpointsR, img_size, None, None)
+    # Save calibration results
+    np.savez("stereo_calib_data.npz",
+             mtxL=mtxL, distL=distL,
+             mtxR=mtxR, distR=distR,
+             R=R, T=T, E=E, F=F,
+             img_size=np.asarray(img_size))
 
-# Stereo calibration
-flags = cv2.CALIB_FIX_INTRINSIC
-criteria = (cv2.TermCriteria_MAX_ITER + cv2.TermCriteria_EPS, 100, 1e-5)
+    print("Stereo calibration completed and saved to 'stereo_calib_data.npz'.")
 
-retStereo, mtxL, distL, mtxR, distR, R, T, E, F = cv2.stereoCalibrate(
-    objpoints, imgpointsL, imgpointsR,
-    mtxL, distL,
-    mtxR, distR,
-    img_size,
-    criteria=criteria,
-    flags=flags
-)
+    # Precomputed rectification bundles, one per resolution the runtime may switch to
+    if args.bundle_sizes:
+        sizes = [tuple(int(v) for v in size.split("x")) for size in args.bundle_sizes.split(",")]
+    else:
+        sizes = sorted({tuple(img_size)} | {p.resolution for p in profiles.PROFILES.values()})
+    for size in sizes:
+        path = calib_bundle.bundle_path(size)
+        calib_bundle.save_bundle(calib_bundle.build_bundle(size, "stereo_calib_data.npz"), path)
+        print(f"Wrote calibration bundle {path}")
 
-# Save calibration results
-np.savez("stereo_calib_data.npz", 
-         mtxL=mtxL, distL=distL, 
-         mtxR=mtxR, distR=distR, 
-         R=R, T=T, E=E, F=F)
 
-print("Stereo calibration completed and saved to 'stereo_calib_data.npz'.")
+if __name__ == "__main__":
+    main()
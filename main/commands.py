@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# === Typed commands written by the client ===
+# Grammar (one command per write, case-insensitive):
+#   shutdown
+#   profile <name>
+#   set resolution <width>x<height>
+#   set sgbm <preset>
+#   set stereo <engine>
+#   set detector <weights>
+#   set fps <rate>
+
+
+@dataclass(frozen=True)
+class Shutdown:
+    pass
+
+
+@dataclass(frozen=True)
+class SetProfile:
+    name: str
+
+
+@dataclass(frozen=True)
+class SetResolution:
+    size: Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class SetSgbmPreset:
+    preset: str
+
+
+@dataclass(frozen=True)
+class SetStereoEngine:
+    engine: str
+
+
+@dataclass(frozen=True)
+class SetDetector:
+    weights: str
+
+
+@dataclass(frozen=True)
+class SetFrameRate:
+    fps: float
+
+
+def parse_command(message: str):
+    """Parse one client write into a command object, or None if it is not a command."""
+    words = message.strip().split()
+    if not words:
+        return None
+    verb = words[0].lower()
+    try:
+        if verb == "shutdown" and len(words) == 1:
+            return Shutdown()
+        if verb == "profile" and len(words) == 2:
+            return SetProfile(words[1].lower())
+        if verb == "set" and len(words) == 3:
+            key, value = words[1].lower(), words[2]
+            if key == "resolution":
+                width, height = value.lower().split("x")
+                return SetResolution((int(width), int(height)))
+            if key == "sgbm":
+                return SetSgbmPreset(value.lower())
+            if key == "stereo":
+                return SetStereoEngine(value.lower())
+            if key == "detector":
+                return SetDetector(value)
+            if key == "fps":
+                return SetFrameRate(float(value))
+    except ValueError:
+        logger.warning(f"Malformed command: {message!r}")
+    return None
+
+
+# === Dispatcher ===
+Handler = Callable[[object], Awaitable[None]]
+
+
+class CommandDispatcher:
+    """Runs command handlers on the event loop, off the GATT callback.
+
+    `submit` may be called from any thread (bless invokes write callbacks from its own);
+    handlers are coroutines executed one at a time in arrival order by `run`.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.handlers: Dict[Type, Handler] = {}
+
+    def register(self, command_type: Type, handler: Handler):
+        self.handlers[command_type] = handler
+
+    def submit(self, command) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, command)
+
+    async def run(self):
+        while True:
+            command = await self.queue.get()
+            handler: Optional[Handler] = self.handlers.get(type(command))
+            if handler is None:
+                logger.warning(f"No handler registered for {command}")
+                continue
+            try:
+                await handler(command)
+            except Exception:
+                logger.exception(f"Command {command} failed")
+
+
+async def shutdown_device(_command: Shutdown):
+    logger.info("Shutdown requested by client.")
+    process = await asyncio.create_subprocess_exec("sudo", "shutdown", "now")
+    await process.wait()
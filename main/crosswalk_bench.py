@@ -0,0 +1,122 @@
+import argparse
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import detectors
+import stats
+
+# === Crosswalk back-end benchmark ===
+# Times the cv2.dnn and ONNX Runtime crosswalk back-ends (detectors.CROSSWALK_BACKENDS) on the
+# same images, on the full frame and on the lower-band ROI the profiles use, optionally with YOLO
+# running in a second thread the way the pipeline runs it. Run it on the Pi:
+#
+#   python crosswalk_bench.py --threads 1,2,4 --with-yolo
+#
+# The "ort" rows include the first-load graph optimisation only in their load time; run twice to
+# see the load time with the cached optimised model.
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def load_images(folder, size, count):
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in Path(folder).glob(pattern))[:count]
+    imgs = [cv2.resize(img, size) for img in (cv2.imread(str(p)) for p in paths) if img is not None]
+    if not imgs:
+        print(f"No images in {folder}; using noise frames.")
+        rng = np.random.default_rng(0)
+        imgs = [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+    return imgs
+
+
+class YoloLoad(threading.Thread):
+    """Keeps YOLO busy on the same images, like the pipeline's concurrent detection stage."""
+
+    def __init__(self, weights, input_size, imgs):
+        super().__init__(daemon=True)
+        self.detector = detectors.YoloDetector(weights, input_size)
+        self.imgs = imgs
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            for img in self.imgs:
+                if self.stopped.is_set():
+                    return
+                self.detector.detect(img)
+
+
+def time_backend(backend, threads, args, imgs, band_top):
+    start = time.perf_counter()
+    detector = detectors.make_crosswalk_detector(backend, args.model, args.input_size,
+                                                 keep_aspect=band_top is not None, threads=threads)
+    load_s = time.perf_counter() - start
+    views = imgs if band_top is None else [img[int(img.shape[0] * band_top):] for img in imgs]
+
+    for view in views[:args.warmup]:
+        detector.detect(view)
+    latencies, boxes = [], []
+    for i in range(args.iterations):
+        view = views[i % len(views)]
+        start = time.perf_counter()
+        result = detector.detect(view)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if i < len(views):
+            boxes.append(result)
+    return load_s, latencies, detector.input_shape(views[0]), boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crosswalk model's cv2.dnn and ONNX Runtime back-ends")
+    parser.add_argument("--model", default=detectors.CROSSWALK_MODEL_PATH)
+    parser.add_argument("--input-size", type=int, default=detectors.CROSSWALK_INPUT_SIZE)
+    parser.add_argument("--images", default="../Images/testIMG/images")
+    parser.add_argument("--count", type=int, default=20, help="images to cycle through")
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--band", type=float, default=0.5, help="ROI band top (fraction of height); <0 to skip")
+    parser.add_argument("--backends", default=",".join(detectors.CROSSWALK_BACKENDS))
+    parser.add_argument("--threads", default=str(detectors.CROSSWALK_ORT_THREADS),
+                        help="comma-separated intra-op thread counts for ort")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--with-yolo", action="store_true", help="run YOLO concurrently, as the pipeline does")
+    parser.add_argument("--yolo-model", default="yolo11n.pt")
+    parser.add_argument("--yolo-size", type=int, default=320)
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.resolution.split("x"))
+    imgs = load_images(args.images, size, args.count)
+    yolo = None
+    if args.with_yolo:
+        yolo = YoloLoad(args.yolo_model, args.yolo_size, imgs)
+        yolo.start()
+
+    runs = []
+    for backend in args.backends.split(","):
+        for threads in ([int(t) for t in args.threads.split(",")] if backend == "ort" else [None]):
+            runs.append((backend, threads))
+
+    print(f"{'backend':<8} {'threads':>7} {'roi':<6} {'input':>9} {'load s':>7} "
+          f"{'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'boxes':>6}")
+    reference = {}
+    try:
+        for band_top in ([None] + ([args.band] if args.band >= 0 else [])):
+            for backend, threads in runs:
+                load_s, latencies, (w, h), boxes = time_backend(backend, threads or 0, args, imgs, band_top)
+                count = sum(len(b) for b in boxes)
+                reference.setdefault(band_top, count)
+                print(f"{backend:<8} {threads or '-':>7} {'full' if band_top is None else 'band':<6} "
+                      f"{f'{w}x{h}':>9} {load_s:7.2f} {np.mean(latencies):8.1f} "
+                      f"{stats.percentile(latencies, 50):7.1f} {stats.percentile(latencies, 95):7.1f} {count:>6}"
+                      + ("" if count == reference[band_top] else "  (box count differs from the first back-end)"))
+    finally:
+        if yolo:
+            yolo.stopped.set()
+            yolo.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
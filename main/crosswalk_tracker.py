@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# === Crosswalk scheduling and state ===
+# Crosswalk markings are on the ground, so with a chest-mounted camera they only show up in the
+# lower part of the frame, and they do not move in the world. Running the network on the whole
+# frame, squashed to a square, on every frame is mostly wasted work. Instead:
+#   - with `band_top` set, the net only sees the rows below that fraction of the frame height, at
+#     their native aspect ratio (CrosswalkDetector keep_aspect), e.g. 512x192 instead of 512x512
+#     for the lower 50% of a 640x480 frame;
+#   - it only runs every `every` frames;
+#   - in between, each crosswalk it found is held with its last box and last measured distance,
+#     and a confidence that halves every `half_life_s`. A crosswalk is dropped once that falls
+#     below `min_conf`, or replaced when a later run finds it again (matched by box overlap).
+#     When the road surface gives no disparity the last distance is reported as held, with its
+#     age (see Pipeline.locate), since the user may have walked on since it was measured.
+#
+# `band_top` None runs on the full frame, which together with `every` 1 is the old behaviour.
+
+
+@dataclass
+class Crosswalk:
+    box: Tuple[int, int, int, int]      # (x1, y1, x2, y2) in full-frame pixels
+    conf: float                         # detector confidence when last seen
+    seen_at: float
+    distance_cm: Optional[float] = None     # last distance the disparity could give...
+    measured_at: Optional[float] = None     # ...and when
+
+    def confidence(self, now, half_life_s):
+        return self.conf * 0.5 ** (max(0.0, now - self.seen_at) / half_life_s)
+
+
+def _iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class CrosswalkTracker:
+    def __init__(self, detector, band_top=None, every=1, half_life_s=2.0, min_conf=0.15, match_iou=0.3):
+        self.detector = detector
+        self.band_top = band_top            # top of the searched band, as a fraction of the height
+        self.every = max(1, int(every))
+        self.half_life_s = half_life_s
+        self.min_conf = min_conf
+        self.match_iou = match_iou
+        self.crosswalks = []                # Crosswalk, in the order boxes() returns them
+
+    def band(self, img):
+        """The part of `img` the network sees, and the row it starts at."""
+        if self.band_top is None:
+            return img, 0
+        y0 = min(img.shape[0] - 1, int(img.shape[0] * self.band_top))
+        return img[y0:], y0
+
+    def _merge(self, boxes, now):
+        fresh = []
+        for x1, y1, x2, y2, conf in boxes:
+            box = (x1, y1, x2, y2)
+            previous = max(self.crosswalks, key=lambda c: _iou(c.box, box), default=None)
+            crosswalk = Crosswalk(box, conf, now)
+            if previous is not None and _iou(previous.box, box) >= self.match_iou:
+                # Same crosswalk: keep its distance until this frame's disparity gives a new one
+                crosswalk.distance_cm, crosswalk.measured_at = previous.distance_cm, previous.measured_at
+                self.crosswalks.remove(previous)
+            fresh.append(crosswalk)
+        # Anything not seen again keeps decaying from when it was last seen
+        self.crosswalks = fresh + self.crosswalks
+
+    def update(self, img, frame_index, now):
+        """Run the network if this frame is due, then return the held boxes with decayed confidence."""
+        if frame_index % self.every == 0:
+            view, y0 = self.band(img)
+            boxes = self.detector.detect(view)
+            self._merge([(x1, y1 + y0, x2, y2 + y0, conf) for x1, y1, x2, y2, conf in boxes], now)
+        self.crosswalks = [c for c in self.crosswalks if c.confidence(now, self.half_life_s) >= self.min_conf]
+        return self.boxes(now)
+
+    def boxes(self, now):
+        return [c.box + (c.confidence(now, self.half_life_s),) for c in self.crosswalks]
+
+    def clear(self):
+        self.crosswalks = []
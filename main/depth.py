@@ -0,0 +1,174 @@
+import numpy as np
+
+import stereo
+
+# === Obstacle search in the disparity domain ===
+# Depth falls monotonically as disparity grows, so "nearest" is "largest disparity" and nothing
+# needs reprojecting until a winner has been picked. The frame is cut into small tiles and each
+# tile is summarised by a high percentile of its valid disparities, which ignores the isolated
+# speckles a single-pixel argmin latches onto.
+
+TILE = 16              # tile edge in pixels
+PERCENTILE = 90        # robust "near edge" of each tile
+MIN_VALID_FRACTION = 0.3
+
+
+def matcher_roi(rect_roi, num_disparities, block_size=5):
+    """Intersect the rectified valid ROI with the columns the matcher can actually fill.
+
+    The leftmost `num_disparities` columns (plus half a block) never get a match; that band is
+    where the old border artifacts came from.
+    """
+    x, y, w, h = rect_roi
+    left = max(x, num_disparities + block_size // 2)
+    return left, y, max(0, x + w - left), h
+
+
+def tile_disparities(disparity, roi, tile=TILE, percentile=PERCENTILE, min_valid=MIN_VALID_FRACTION, mask=None):
+    """Per-tile robust disparity over `roi`.
+
+    Returns an (rows, cols) float32 array (NaN where a tile has too few valid pixels) and the
+    (x, y) pixel origin of tile (0, 0). `mask`, if given, is a full-frame boolean array of pixels
+    allowed to count (e.g. not ground).
+    """
+    x, y, w, h = roi
+    rows, cols = h // tile, w // tile
+    region = disparity[y:y + rows * tile, x:x + cols * tile]
+    valid = (region > stereo.VALID_DISP_MIN) & (region < stereo.VALID_DISP_MAX)
+    if mask is not None:
+        valid &= mask[y:y + rows * tile, x:x + cols * tile]
+
+    # (rows, cols, tile*tile) views; invalid pixels sort below every valid one
+    blocks = np.where(valid, region, -1.0).reshape(rows, tile, cols, tile).swapaxes(1, 2).reshape(rows, cols, -1)
+    counts = valid.reshape(rows, tile, cols, tile).sum(axis=(1, 3))
+    blocks = np.sort(blocks, axis=2)
+    n = tile * tile
+    k = (n - counts) + np.floor(percentile / 100 * np.maximum(counts - 1, 0)).astype(int)
+    values = np.take_along_axis(blocks, np.minimum(k, n - 1)[..., None], axis=2)[..., 0].astype(np.float32)
+    values[counts < min_valid * n] = np.nan
+    return values, (x, y)
+
+
+# === Sector obstacle map ===
+# The view is split into angular columns (by bearing) and horizontal bands; each sector holds
+# the nearest robust distance in it. Built from the same tile grid in one reduction per frame,
+# after which direction and "what is nearest to my left" are lookups. The map also keeps the
+# centre of the nearest tile, which is where the no-detection fallback points.
+
+DEFAULT_BEARING_EDGES_DEG = (-15.0, 15.0)          # left | ahead | right
+DEFAULT_SECTOR_NAMES = ("to the left", "ahead", "to the right")
+DEFAULT_BAND_EDGES = (0.0, 1.0)                     # fractions of the frame height, top to bottom
+
+
+class SectorMap:
+    def __init__(self, distances_cm, disparities, col_edges, row_edges, names, focal, cx, nearest_point=None):
+        self.distances_cm = distances_cm    # (bands, columns), inf where nothing was seen
+        self.disparities = disparities      # (bands, columns), NaN where nothing was seen
+        self.col_edges = col_edges          # inner pixel x boundaries between columns
+        self.row_edges = row_edges          # inner pixel y boundaries between bands
+        self.names = names
+        self.focal, self.cx = focal, cx     # rectified focal length and principal point (px)
+        self.nearest_point = nearest_point  # (x, y) centre of the nearest tile, None if none was valid
+
+    def bearing_for_x(self, x):
+        """Bearing in degrees of pixel column `x`, with the same camera model as the sector edges."""
+        return float(np.degrees(np.arctan((x - self.cx) / self.focal)))
+
+    def column_for_x(self, x):
+        return int(np.searchsorted(self.col_edges, x, side="right"))
+
+    def direction_for_x(self, x):
+        return self.names[self.column_for_x(x)]
+
+    def nearest(self, column=None):
+        """(distance_cm, band, column) of the nearest sector, optionally within one column."""
+        distances = self.distances_cm if column is None else self.distances_cm[:, column:column + 1]
+        band, col = np.unravel_index(np.argmin(distances), distances.shape)
+        return float(distances[band, col]), int(band), int(col if column is None else column)
+
+    def summary(self):
+        return ", ".join(f"{name}: {d / 100:.1f} m" if np.isfinite(d) else f"{name}: clear"
+                         for name, d in zip(self.names, self.distances_cm.min(axis=0)))
+
+
+def sector_map(disparity, roi, Q, bearing_edges_deg=DEFAULT_BEARING_EDGES_DEG, band_edges=DEFAULT_BAND_EDGES,
+               names=DEFAULT_SECTOR_NAMES, tile=TILE, percentile=PERCENTILE, mask=None):
+    values, (x0, y0) = tile_disparities(disparity, roi, tile, percentile, mask=mask)
+    rows, cols = values.shape
+    height = disparity.shape[0]
+
+    # Bearing edges to pixel columns with the rectified focal length and principal point from Q
+    focal, cx = Q[2, 3], -Q[0, 3]
+    col_edges = cx + focal * np.tan(np.radians(np.asarray(bearing_edges_deg, dtype=np.float64)))
+    row_edges = np.asarray(band_edges[1:-1], dtype=np.float64) * height
+
+    # Sector boundaries in tile units; every sector gets at least its first tile index
+    tile_cols = np.clip(np.ceil((col_edges - x0) / tile).astype(int), 0, cols)
+    tile_rows = np.clip(np.ceil((row_edges - y0) / tile).astype(int), 0, rows)
+    col_starts = np.concatenate(([0], tile_cols))
+    row_starts = np.concatenate(([0], tile_rows))
+
+    n_bands, n_cols = len(row_starts), len(col_starts)
+    sector_disp = np.full((n_bands, n_cols), np.nan, dtype=np.float32)
+    if rows and cols:
+        filled = np.nan_to_num(values, nan=-1.0)
+        # reduceat needs in-range, non-decreasing starts; empty sectors are masked out afterwards
+        reduced = np.maximum.reduceat(np.maximum.reduceat(filled, np.minimum(row_starts, rows - 1), axis=0),
+                                      np.minimum(col_starts, cols - 1), axis=1)
+        empty_rows = np.diff(np.concatenate((row_starts, [rows]))) <= 0
+        empty_cols = np.diff(np.concatenate((col_starts, [cols]))) <= 0
+        reduced[empty_rows, :] = -1.0
+        reduced[:, empty_cols] = -1.0
+        sector_disp = np.where(reduced > 0, reduced, np.nan).astype(np.float32)
+
+    # The nearest sector holds the largest tile disparity, so its tile is the overall argmax
+    nearest_point = None
+    if values.size and not np.all(np.isnan(values)):
+        row, col = np.unravel_index(np.nanargmax(values), values.shape)
+        nearest_point = (x0 + col * tile + tile // 2, y0 + row * tile + tile // 2)
+
+    with np.errstate(invalid="ignore"):
+        distances = np.where(np.isnan(sector_disp), np.inf, stereo.disparity_to_cm(sector_disp, Q))
+    return SectorMap(distances, sector_disp, col_edges, row_edges, names, focal, cx, nearest_point)
+
+
+# === Per-box disparity statistics ===
+# Median (or trimmed mean) of the valid disparities inside each box, over every pixel of the box.
+# This is a loop over the boxes: each one is a slice, a validity mask and an O(n) partition
+# (np.median), so the cost is the boxes' total area and nothing frame-sized is built. A frame has
+# a handful of boxes, which keeps the loop cheap. Binning the disparities so that every box could
+# be read from one integral histogram needs bins about 1 px wide to keep far objects' distances
+# accurate, and at that width the table is tens of MB per frame.
+
+
+def box_disparity_stats(disparity, boxes, mask=None, stat="median", trim=0.2,
+                        d_min=stereo.VALID_DISP_MIN, d_max=stereo.VALID_DISP_MAX):
+    """Median (or `trim`-trimmed mean) valid disparity inside every (x1, y1, x2, y2, ...) box.
+
+    Returns (values, counts): float32 arrays of length len(boxes); values is NaN for boxes with no
+    valid pixels. `mask` is an optional full-frame boolean array of pixels allowed to count.
+    """
+    if stat not in ("median", "trimmed_mean"):
+        raise ValueError(f"Unknown statistic {stat!r}")
+    values = np.full(len(boxes), np.nan, np.float32)
+    counts = np.zeros(len(boxes), np.int32)
+    h, w = disparity.shape[:2]
+
+    for i, box in enumerate(boxes):
+        x1, y1, x2, y2 = (int(v) for v in box[:4])
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+        region = disparity[y1:y2, x1:x2]
+        valid = (region > d_min) & (region < d_max)
+        if mask is not None:
+            valid &= mask[y1:y2, x1:x2]
+        pixels = region[valid]
+        counts[i] = pixels.size
+        if pixels.size == 0:
+            continue
+        if stat == "median":
+            values[i] = np.median(pixels)
+        else:
+            pixels.sort()
+            cut = int(trim * pixels.size)
+            values[i] = pixels[cut:pixels.size - cut].mean() if pixels.size > 2 * cut else np.median(pixels)
+    return values, counts
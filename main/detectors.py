@@ -0,0 +1,239 @@
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+import artifacts
+
+# === Detector wrappers shared by the runtime and the offline tools ===
+# Boxes are returned in the pixel coordinates of the image passed in:
+#   crosswalk: (x1, y1, x2, y2, conf)
+#   yolo:      (x1, y1, x2, y2, conf, label)
+#
+# The crosswalk model has two interchangeable back-ends (CROSSWALK_BACKENDS):
+#   dnn  cv2.dnn, no extra dependency
+#   ort  ONNX Runtime on the CPU: full graph optimisation (done once, kept in artifacts.py's store),
+#        an explicit intra-op thread count so it does not fight PyTorch's YOLO for every core,
+#        and inputs/outputs bound to preallocated arrays
+
+CROSSWALK_MODEL_PATH = "Crosswalks_ONNX_Model.onnx"
+CROSSWALK_INPUT_SIZE = 512
+CROSSWALK_CONF_THRESHOLD = 0.3
+CROSSWALK_STRIDE = 32       # non-square inputs are rounded to a multiple of this
+CROSSWALK_BACKENDS = ("dnn", "ort")
+CROSSWALK_ORT_THREADS = 2
+
+
+def decode_crosswalk_output(output: np.ndarray, w_orig: int, h_orig: int, input_size,
+                            conf_threshold: float) -> List[Tuple[int, int, int, int, float]]:
+    """Turn one (5, N) crosswalk output (cx, cy, w, h, conf) into clipped boxes.
+
+    `input_size` is the network input edge, or its (width, height) when it was not square.
+    """
+    cx, cy, w, h, conf = output
+    keep = conf >= conf_threshold
+    cx, cy, w, h, conf = cx[keep], cy[keep], w[keep], h[keep], conf[keep]
+
+    in_w, in_h = (input_size, input_size) if np.isscalar(input_size) else input_size
+    sx, sy = w_orig / in_w, h_orig / in_h
+    x1 = np.clip(((cx - w / 2) * sx).astype(int), 0, w_orig - 1)
+    y1 = np.clip(((cy - h / 2) * sy).astype(int), 0, h_orig - 1)
+    x2 = np.clip(((cx + w / 2) * sx).astype(int), 0, w_orig - 1)
+    y2 = np.clip(((cy + h / 2) * sy).astype(int), 0, h_orig - 1)
+    return [(int(a), int(b), int(c), int(d), float(e)) for a, b, c, d, e in zip(x1, y1, x2, y2, conf)]
+
+
+def crosswalk_input_shape(img: np.ndarray, input_size: int, keep_aspect: bool) -> Tuple[int, int]:
+    if not keep_aspect:
+        return input_size, input_size
+    height = round(input_size * img.shape[0] / img.shape[1] / CROSSWALK_STRIDE) * CROSSWALK_STRIDE
+    return input_size, int(min(input_size, max(CROSSWALK_STRIDE, height)))
+
+
+class CrosswalkDetector:
+    """Crosswalk ONNX model through cv2.dnn. The network is loaded once, not per frame.
+
+    With `keep_aspect` the input is `input_size` wide and as tall as the image's aspect ratio
+    asks for (rounded to the model stride), so a wide strip of the frame costs a fraction of a
+    square input. Models exported with fixed input dimensions fall back to the square input.
+    """
+
+    def __init__(self, model_path: str = CROSSWALK_MODEL_PATH, input_size: int = CROSSWALK_INPUT_SIZE,
+                 conf_threshold: float = CROSSWALK_CONF_THRESHOLD, keep_aspect: bool = False):
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.batch_supported = True
+        self.keep_aspect = keep_aspect
+
+    def input_shape(self, img: np.ndarray) -> Tuple[int, int]:
+        """(width, height) of the network input for `img`."""
+        return crosswalk_input_shape(img, self.input_size, self.keep_aspect)
+
+    def _blob(self, imgs: Sequence[np.ndarray]) -> np.ndarray:
+        size = self.input_shape(imgs[0])
+        return cv2.dnn.blobFromImages(list(imgs), scalefactor=1 / 255.0, size=size, swapRB=True, crop=False)
+
+    def detect(self, img: np.ndarray):
+        if self.keep_aspect:
+            try:
+                self.net.setInput(self._blob([img]))
+                output = self.net.forward()[0]
+            except cv2.error:
+                print("Crosswalk model has a fixed input size; using square inputs.")
+                self.keep_aspect = False
+                return self.detect(img)
+            return decode_crosswalk_output(output, img.shape[1], img.shape[0], self.input_shape(img),
+                                           self.conf_threshold)
+        return self.detect_batch([img])[0]
+
+    def detect_batch(self, imgs: Sequence[np.ndarray]):
+        if len(imgs) > 1 and self.batch_supported:
+            try:
+                self.net.setInput(self._blob(imgs))
+                outputs = self.net.forward()
+            except cv2.error:
+                # Models exported with a fixed batch dimension of 1
+                self.batch_supported = False
+                return self.detect_batch(imgs)
+        else:
+            outputs = []
+            for img in imgs:
+                self.net.setInput(self._blob([img]))
+                outputs.append(self.net.forward()[0])
+        return [decode_crosswalk_output(out, img.shape[1], img.shape[0], self.input_shape(img), self.conf_threshold)
+                for out, img in zip(outputs, imgs)]
+
+
+class OrtCrosswalkDetector:
+    """Crosswalk ONNX model through an ONNX Runtime CPU session; same interface as CrosswalkDetector.
+
+    The first load runs every graph optimisation and keeps the result in the artifact store;
+    later loads read that and skip optimising again.
+
+    Each input size gets a resize buffer, an input blob and an output array, bound to the
+    session once, so a frame is one resize, one in-place normalisation and one run.
+    """
+
+    def __init__(self, model_path: str = CROSSWALK_MODEL_PATH, input_size: int = CROSSWALK_INPUT_SIZE,
+                 conf_threshold: float = CROSSWALK_CONF_THRESHOLD, keep_aspect: bool = False,
+                 threads: int = CROSSWALK_ORT_THREADS):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Idle workers would otherwise spin on the cores YOLO is using
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        self.session = ort.InferenceSession(artifacts.ort_optimized(model_path), options,
+                                            providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        fixed = [dim for dim in model_input.shape[2:] if isinstance(dim, int)]
+        if len(fixed) == 2:
+            if keep_aspect:
+                print("Crosswalk model has a fixed input size; using square inputs.")
+            keep_aspect, input_size = False, fixed[1]
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.keep_aspect = keep_aspect
+        self.bindings = {}      # (width, height) -> (resized, blob, output, io_binding)
+
+    def input_shape(self, img: np.ndarray) -> Tuple[int, int]:
+        """(width, height) of the network input for `img`."""
+        return crosswalk_input_shape(img, self.input_size, self.keep_aspect)
+
+    def _binding(self, size):
+        if size not in self.bindings:
+            w, h = size
+            resized = np.empty((h, w, 3), np.uint8)
+            blob = np.zeros((1, 3, h, w), np.float32)
+            # One plain run tells us the output shape for this input size
+            output = np.ascontiguousarray(self.session.run([self.output_name], {self.input_name: blob})[0],
+                                          dtype=np.float32)
+            binding = self.session.io_binding()
+            binding.bind_input(self.input_name, "cpu", 0, np.float32, blob.shape, blob.ctypes.data)
+            binding.bind_output(self.output_name, "cpu", 0, np.float32, output.shape, output.ctypes.data)
+            self.bindings[size] = (resized, blob, output, binding)
+        return self.bindings[size]
+
+    def detect(self, img: np.ndarray):
+        size = self.input_shape(img)
+        resized, blob, output, binding = self._binding(size)
+        cv2.resize(img, size, dst=resized, interpolation=cv2.INTER_LINEAR)
+        # BGR HWC uint8 -> RGB CHW float in [0, 1], written straight into the bound input
+        np.multiply(resized[:, :, ::-1].transpose(2, 0, 1), 1 / 255.0, out=blob[0], casting="unsafe")
+        self.session.run_with_iobinding(binding)
+        return decode_crosswalk_output(output[0], img.shape[1], img.shape[0], size, self.conf_threshold)
+
+    def detect_batch(self, imgs: Sequence[np.ndarray]):
+        return [self.detect(img) for img in imgs]
+
+
+def make_crosswalk_detector(backend: str = "dnn", model_path: str = CROSSWALK_MODEL_PATH,
+                            input_size: int = CROSSWALK_INPUT_SIZE, conf_threshold: float = CROSSWALK_CONF_THRESHOLD,
+                            keep_aspect: bool = False, threads: int = CROSSWALK_ORT_THREADS):
+    if backend == "ort":
+        return OrtCrosswalkDetector(model_path, input_size, conf_threshold, keep_aspect, threads)
+    if backend == "dnn":
+        return CrosswalkDetector(model_path, input_size, conf_threshold, keep_aspect)
+    raise ValueError(f"Unknown crosswalk backend '{backend}'; choose from {', '.join(CROSSWALK_BACKENDS)}")
+
+
+class YoloDetector:
+    """Ultralytics YOLO. `input_size` None runs at the full frame size, otherwise e.g. 320.
+
+    With `export_format` ("torchscript" or "onnx") the weights are exported once for that input
+    size into the artifact store and later starts load the export instead of building the
+    PyTorch model; if the export fails the .pt weights are used as before.
+    """
+
+    def __init__(self, weights: str = "yolo11n.pt", input_size=None, conf_threshold: float = 0.7,
+                 export_format=None):
+        from ultralytics import YOLO
+        model_path = weights
+        if export_format:
+            try:
+                model_path = artifacts.yolo_export(weights, export_format, input_size)
+                # Exports have a fixed input size
+                input_size = input_size or artifacts.YOLO_EXPORT_SIZE
+            except Exception as e:
+                print(f"Could not export {weights} to {export_format} ({e}); loading the PyTorch weights.")
+                model_path = weights
+        self.model = YOLO(model_path, task="detect")
+        self.names = self.model.names
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+
+    # ultralytics treats numpy images as BGR, OpenCV's order, so frames go in as captured
+    def detect(self, img_bgr: np.ndarray):
+        return self.detect_batch([img_bgr])[0]
+
+    def detect_batch(self, imgs_bgr: Sequence[np.ndarray]):
+        kwargs = {"conf": self.conf_threshold, "verbose": False}
+        if self.input_size:
+            kwargs["imgsz"] = self.input_size
+        results = self.model(list(imgs_bgr), **kwargs)
+        batch = []
+        for result in results:
+            xyxy = result.boxes.xyxy.cpu().numpy().astype(int)
+            confs = result.boxes.conf.cpu().numpy()
+            classes = result.boxes.cls.cpu().numpy().astype(int)
+            batch.append([(x1, y1, x2, y2, float(conf), self.names[cls])
+                          for (x1, y1, x2, y2), conf, cls in zip(xyxy, confs, classes)])
+        return batch
+
+
+def draw_crosswalks(img: np.ndarray, boxes, color=(255, 0, 0)):
+    for x1, y1, x2, y2, conf in boxes:
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(img, f"Crosswalk {conf:.2f}", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+
+def draw_objects(img: np.ndarray, boxes, color=(0, 255, 0)):
+    for x1, y1, x2, y2, conf, label in boxes:
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(img, f"{label} {conf:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
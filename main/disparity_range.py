@@ -0,0 +1,100 @@
+import time
+from collections import deque
+
+import numpy as np
+
+import stereo
+
+# === LiDAR-primed disparity search range ===
+# Matcher cost grows with the number of disparities searched, and the presets size that for the
+# nearest thing we ever expect to see. Most frames need much less: the TF-Luna says how far away
+# the scene straight ahead is, and the previous frame's disparity distribution says what range
+# the rest of the scene spans. The planner narrows the search to that window plus a margin, and
+# goes back to the full range whenever it cannot trust its evidence:
+#   - the previous frame had too little valid disparity (or there is no previous frame),
+#   - many pixels were pinned against a narrowed edge of the window, i.e. the scene extends past it,
+#   - every `refresh_every` frames, so something entering from the side is not missed for long.
+#
+# Windows are rounded to multiples of 16, so the matcher settings only change when the scene does.
+
+
+def _round_up_16(n):
+    return max(16, int(np.ceil(n / 16.0)) * 16)
+
+
+class RangePlanner:
+    def __init__(self, Q, full_num_disparities, margin=0.25, headroom_px=4.0, low_percentile=2.0,
+                 high_percentile=99.5, min_valid_fraction=0.2, edge_fraction=0.03, refresh_every=15,
+                 lidar_max_age_s=0.5, lidar_min_strength=100, step=4):
+        self.Q = Q
+        self.full_num = int(full_num_disparities)
+        self.margin = margin                    # relative widening of the observed range
+        self.headroom_px = headroom_px          # extra disparity above it for approaching objects
+        self.low_percentile = low_percentile
+        self.high_percentile = high_percentile
+        self.min_valid_fraction = min_valid_fraction
+        self.edge_fraction = edge_fraction
+        self.refresh_every = refresh_every
+        self.lidar_max_age_s = lidar_max_age_s
+        self.lidar_min_strength = lidar_min_strength
+        self.step = step                        # subsampling of the previous frame
+        self.window = (0, self.full_num)        # (min_disparity, num_disparities)
+        self.stats = None                       # (low, high) disparity of the last trusted frame
+        self.lidar = deque(maxlen=5)            # (timestamp, disparity)
+        self.frames_since_full = 0
+
+    @property
+    def is_full(self):
+        return self.window == (0, self.full_num)
+
+    def add_lidar(self, distance_cm, strength=None, timestamp=None):
+        """Record a TF-Luna reading; weak or out-of-range returns are ignored."""
+        if distance_cm <= 0 or (strength is not None and
+                                (strength < self.lidar_min_strength or strength == 65535)):
+            return
+        disparity = float(stereo.cm_to_disparity(distance_cm, self.Q))
+        self.lidar.append((time.monotonic() if timestamp is None else timestamp, disparity))
+
+    def observe(self, disparity, roi):
+        """Fold the disparity computed with the current window into the next plan."""
+        x, y, w, h = roi
+        sub = disparity[y:y + h:self.step, x:x + w:self.step]
+        valid = sub[sub >= stereo.VALID_DISP_MIN]
+        if sub.size == 0 or valid.size < self.min_valid_fraction * sub.size:
+            self.stats = None
+            return
+        min_d, num = self.window
+        pinned_low = min_d > 0 and np.mean(valid < min_d + 1) > self.edge_fraction
+        pinned_high = min_d + num < self.full_num and np.mean(valid > min_d + num - 2) > self.edge_fraction
+        if pinned_low or pinned_high:
+            self.stats = None
+            return
+        low, high = np.percentile(valid, (self.low_percentile, self.high_percentile))
+        self.stats = (float(low), float(high))
+
+    def plan(self, now=None):
+        """(min_disparity, num_disparities) to use for the next frame."""
+        self.frames_since_full += 1
+        if self.stats is None or self.frames_since_full >= self.refresh_every:
+            return self._full()
+
+        low, high = self.stats
+        now = time.monotonic() if now is None else now
+        recent = [d for t, d in self.lidar if now - t <= self.lidar_max_age_s]
+        if recent:
+            # The LiDAR only sees the centre spot, so it can widen the window but never narrow it
+            low, high = min(low, min(recent)), max(high, max(recent))
+
+        min_d = int(max(0.0, low * (1 - self.margin))) // 16 * 16
+        num = _round_up_16(high * (1 + self.margin) + self.headroom_px - min_d)
+        if min_d + num > self.full_num:
+            min_d = max(0, self.full_num - num)
+        if num >= self.full_num:
+            return self._full()
+        self.window = (min_d, num)
+        return self.window
+
+    def _full(self):
+        self.frames_since_full = 0
+        self.window = (0, self.full_num)
+        return self.window
@@ -0,0 +1,138 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+import detectors
+
+# === Offline batch evaluation ===
+# Replaces running crosswalkTest.py / Images/testIMG.py one image at a time. Images are split
+# into one shard per worker process; each worker loads its models once, prefetches and decodes
+# images on a reader thread, runs batched inference, and hands annotated frames to a writer pool.
+#
+#   python evaluate.py --detectors crosswalk,yolo --input ../Images/testIMG/images \
+#       --output ../Images/combined_output --workers 4 --batch 8
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+_crosswalk = None
+_yolo = None
+
+
+def init_worker(args):
+    """Load the models once per worker process."""
+    global _crosswalk, _yolo
+    # One core per worker; let the process pool provide the parallelism
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    names = args.detectors.split(",")
+    if "crosswalk" in names:
+        _crosswalk = detectors.make_crosswalk_detector(args.crosswalk_backend, args.crosswalk_model,
+                                                       args.crosswalk_size, args.crosswalk_conf, threads=1)
+    if "yolo" in names:
+        _yolo = detectors.YoloDetector(args.yolo_model, args.yolo_size, args.yolo_conf)
+
+
+def _read_batches(paths, batch_size, out_queue):
+    batch = []
+    for path in paths:
+        img = cv2.imread(str(path))
+        if img is None:
+            print(f"Could not read {path}, skipping.")
+            continue
+        batch.append((path, img))
+        if len(batch) == batch_size:
+            out_queue.put(batch)
+            batch = []
+    if batch:
+        out_queue.put(batch)
+    out_queue.put(None)
+
+
+def _write(path, img):
+    # cv2.imwrite reports most failures (missing folder, unknown extension) by returning False
+    if not cv2.imwrite(path, img):
+        raise OSError(f"Could not write {path}")
+
+
+def process_shard(paths, output_dir, batch_size, prefetch, write_threads):
+    """Run one worker's share of the images. Returns (images, inference seconds)."""
+    batches = queue.Queue(maxsize=prefetch)
+    reader = threading.Thread(target=_read_batches, args=(paths, batch_size, batches), daemon=True)
+    reader.start()
+
+    count, infer_seconds, writes = 0, 0.0, []
+    with ThreadPoolExecutor(max_workers=write_threads) as writer:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            imgs = [img for _, img in batch]
+
+            start = time.perf_counter()
+            crosswalks = _crosswalk.detect_batch(imgs) if _crosswalk else [[]] * len(imgs)
+            objects = _yolo.detect_batch(imgs) if _yolo else [[]] * len(imgs)
+            infer_seconds += time.perf_counter() - start
+
+            for (path, img), cw_boxes, obj_boxes in zip(batch, crosswalks, objects):
+                detectors.draw_objects(img, obj_boxes)
+                detectors.draw_crosswalks(img, cw_boxes)
+                writes.append(writer.submit(_write, str(Path(output_dir) / path.name), img))
+            count += len(batch)
+    # Surface write errors here rather than report images that never reached the disk
+    for write in writes:
+        write.result()
+    return count, infer_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-evaluate the crosswalk and YOLO detectors on a folder of images")
+    parser.add_argument("--input", default="../Images/testIMG/images")
+    parser.add_argument("--output", default="../Images/combined_output")
+    parser.add_argument("--detectors", default="crosswalk,yolo", help="comma-separated: crosswalk, yolo")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--prefetch", type=int, default=2, help="decoded batches buffered per worker")
+    parser.add_argument("--write-threads", type=int, default=2)
+    parser.add_argument("--crosswalk-model", default=detectors.CROSSWALK_MODEL_PATH)
+    parser.add_argument("--crosswalk-size", type=int, default=detectors.CROSSWALK_INPUT_SIZE)
+    parser.add_argument("--crosswalk-conf", type=float, default=detectors.CROSSWALK_CONF_THRESHOLD)
+    parser.add_argument("--crosswalk-backend", choices=detectors.CROSSWALK_BACKENDS, default="dnn")
+    parser.add_argument("--yolo-model", default="yolo11s.pt")
+    parser.add_argument("--yolo-size", type=int, default=None, help="inference size, default full frame")
+    parser.add_argument("--yolo-conf", type=float, default=0.25)
+    args = parser.parse_args()
+
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in Path(args.input).glob(pattern))
+    if not paths:
+        print(f"No images found in {args.input}")
+        return
+    os.makedirs(args.output, exist_ok=True)
+    workers = max(1, min(args.workers, len(paths)))
+    shards = [paths[i::workers] for i in range(workers)]
+
+    print(f"Evaluating {len(paths)} images with {workers} workers (batch {args.batch})...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(args,)) as pool:
+        futures = [pool.submit(process_shard, shard, args.output, args.batch, args.prefetch, args.write_threads)
+                   for shard in shards]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+
+    total = sum(count for count, _ in results)
+    infer = sum(seconds for _, seconds in results)
+    print(f"Processed {total} images in {elapsed:.1f} s: {total / elapsed:.1f} images/s "
+          f"({infer / max(total, 1) * 1000:.1f} ms inference per image per worker)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import profiles
+
+logger = logging.getLogger(__name__)
+
+# === Thermal / power governor ===
+# In the enclosure the SoC heats up until the firmware throttles it, after which frame latency
+# more than doubles without warning. The governor samples the SoC temperature, the CPU clock,
+# the firmware throttling flags and the TF-Luna chip temperature, and steps the pipeline down
+# profiles.THERMAL_LADDER before that happens:
+#   - down one step when the SoC is (or, at its current rate of rise, will be within
+#     `lookahead_s`) above `high_c`, when the LiDAR is above `lidar_high_c`, or as soon as
+#     the firmware reports throttling, capping or under-voltage;
+#   - up one step only after `recover_s` below `low_c` with no flags,
+# and never twice within `dwell_s`, so it cannot oscillate. It never goes above the profile the
+# user picked. Every transition is logged with the readings that caused it.
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+CPU_FREQ = "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"
+
+# vcgencmd get_throttled bits that are set while the condition is active
+UNDER_VOLTAGE_NOW = 0x1
+FREQ_CAPPED_NOW = 0x2
+THROTTLED_NOW = 0x4
+SOFT_TEMP_LIMIT_NOW = 0x8
+ACTIVE_FLAGS = UNDER_VOLTAGE_NOW | FREQ_CAPPED_NOW | THROTTLED_NOW | SOFT_TEMP_LIMIT_NOW
+FLAG_NAMES = {UNDER_VOLTAGE_NOW: "under-voltage", FREQ_CAPPED_NOW: "frequency capped",
+              THROTTLED_NOW: "throttled", SOFT_TEMP_LIMIT_NOW: "soft temperature limit"}
+
+
+def read_sysfs_number(path, scale):
+    try:
+        with open(path) as f:
+            return int(f.read().strip()) / scale
+    except (OSError, ValueError):
+        return None
+
+
+def read_soc_temp_c():
+    return read_sysfs_number(THERMAL_ZONE, 1000.0)
+
+
+def read_cpu_freq_mhz():
+    return read_sysfs_number(CPU_FREQ, 1000.0)
+
+
+async def read_throttled():
+    """Firmware throttling flags from `vcgencmd get_throttled`, or None where it is not available."""
+    try:
+        process = await asyncio.create_subprocess_exec("vcgencmd", "get_throttled",
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        stdout, _ = await process.communicate()
+        return int(stdout.decode().strip().split("=")[1], 16)
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def describe_flags(flags):
+    return ", ".join(name for bit, name in FLAG_NAMES.items() if flags & bit) or "none"
+
+
+class Governor:
+    def __init__(self, pipeline, ladder=profiles.THERMAL_LADDER, interval_s=2.0, high_c=75.0, low_c=65.0,
+                 lidar_high_c=55.0, lookahead_s=30.0, dwell_s=20.0, recover_s=60.0, trend_window_s=60.0):
+        self.pipeline = pipeline
+        self.ladder = list(ladder)
+        self.interval_s = interval_s
+        self.high_c = high_c
+        self.low_c = low_c
+        self.lidar_high_c = lidar_high_c    # TF-Luna is rated up to 60 C
+        self.lookahead_s = lookahead_s
+        self.dwell_s = dwell_s
+        self.recover_s = recover_s
+        self.trend_window_s = trend_window_s
+        self.temps = deque()                # (timestamp, SoC temperature)
+        self.ceiling = None                 # ladder index of the profile the user chose
+        self.level = None                   # ladder index currently requested by the governor
+        self.expected = None                # profile object the governor last saw or requested
+        self.last_transition = float("-inf")
+        self.cool_since = None
+
+    def rise_rate(self):
+        """SoC temperature trend in C/s over the trend window (0 until there is enough history)."""
+        if len(self.temps) < 2 or self.temps[-1][0] - self.temps[0][0] < 10:
+            return 0.0
+        (t0, c0), (t1, c1) = self.temps[0], self.temps[-1]
+        return (c1 - c0) / (t1 - t0)
+
+    def _sync_with_user(self):
+        """Follow profile changes made by someone else (BLE commands) and treat them as the new ceiling."""
+        current = self.pipeline.pending_profile or self.pipeline.profile
+        if current is self.expected:
+            return
+        self.expected = current
+        if current.name in self.ladder and profiles.PROFILES.get(current.name) is current:
+            self.ceiling = self.level = self.ladder.index(current.name)
+            logger.info(f"Governor following profile '{current.name}'.")
+        else:
+            self.ceiling = self.level = None
+            logger.info(f"Profile '{current.name}' is not on the thermal ladder; governor paused.")
+
+    def decide(self, now, soc_c, flags, lidar_c):
+        """New ladder index and the reason for it, or (None, None) to stay."""
+        if self.level is None or now - self.last_transition < self.dwell_s:
+            return None, None
+        predicted = None if soc_c is None else soc_c + max(self.rise_rate(), 0.0) * self.lookahead_s
+
+        reasons = []
+        if flags is not None and flags & ACTIVE_FLAGS:
+            reasons.append(f"firmware reports {describe_flags(flags)}")
+        if predicted is not None and predicted >= self.high_c:
+            reasons.append(f"SoC {soc_c:.1f} C, {predicted:.1f} C expected in {self.lookahead_s:.0f} s")
+        if lidar_c is not None and lidar_c >= self.lidar_high_c:
+            reasons.append(f"LiDAR {lidar_c:.1f} C")
+        if reasons:
+            self.cool_since = None
+            if self.level + 1 < len(self.ladder):
+                return self.level + 1, "; ".join(reasons)
+            return None, None
+
+        cool = (soc_c is not None and predicted < self.low_c and not (flags or 0) & ACTIVE_FLAGS
+                and (lidar_c is None or lidar_c < self.lidar_high_c - 5))
+        if not cool:
+            self.cool_since = None
+            return None, None
+        if self.cool_since is None:
+            self.cool_since = now
+        if self.level > self.ceiling and now - self.cool_since >= self.recover_s:
+            self.cool_since = None
+            return self.level - 1, f"SoC {soc_c:.1f} C for {self.recover_s:.0f} s"
+        return None, None
+
+    async def step(self):
+        self._sync_with_user()
+        now = time.monotonic()
+        soc_c = read_soc_temp_c()
+        cpu_mhz = read_cpu_freq_mhz()
+        flags = await read_throttled()
+        lidar_c = self.pipeline.lidar_temperature
+        if soc_c is not None:
+            self.temps.append((now, soc_c))
+            while now - self.temps[0][0] > self.trend_window_s:
+                self.temps.popleft()
+
+        level, reason = self.decide(now, soc_c, flags, lidar_c)
+        if level is None:
+            return
+        old_name, new_name = self.ladder[self.level], self.ladder[level]
+        logger.warning(f"Governor: {old_name} -> {new_name} ({reason}; CPU "
+                       f"{'?' if cpu_mhz is None else f'{cpu_mhz:.0f}'} MHz, "
+                       f"flags {'?' if flags is None else hex(flags)})")
+        self.level = level
+        self.last_transition = now
+        self.expected = self.pipeline.pending_profile = profiles.PROFILES[new_name]
+
+    async def run(self):
+        if read_soc_temp_c() is None:
+            logger.warning(f"No SoC temperature at {THERMAL_ZONE}; governor will rely on firmware flags only.")
+        while True:
+            try:
+                await self.step()
+            except Exception:
+                logger.exception("Governor step failed")
+            await asyncio.sleep(self.interval_s)
@@ -0,0 +1,76 @@
+import numpy as np
+
+import stereo
+
+# === Ground plane from v-disparity ===
+# On a flat sidewalk the ground's disparity grows linearly with image row, so in a histogram of
+# (row, disparity) it shows up as the dominant line in the lower half of the frame. Fitting that
+# line tells us which pixels are just the ground, so the obstacle search and box medians can
+# ignore them.
+#
+# The histogram is built on a subsampled grid and blended into a running average, so each
+# frame costs one bincount over a few thousand pixels and the fit stays stable between frames.
+
+
+class GroundPlane:
+    def __init__(self, max_disparity=stereo.VALID_DISP_MAX, row_step=2, col_step=4, decay=0.7,
+                 tolerance_px=2.0, tolerance_ratio=0.1, min_votes=3.0, start_fraction=0.5):
+        self.max_disparity = int(max_disparity)
+        self.row_step = row_step
+        self.col_step = col_step
+        self.decay = decay                  # weight of the previous histogram
+        self.tolerance_px = tolerance_px    # |d - d_ground| under which a pixel is ground...
+        self.tolerance_ratio = tolerance_ratio  # ...plus this fraction of d_ground
+        self.min_votes = min_votes
+        self.start_fraction = start_fraction    # only rows below this fraction of the height vote
+        self.hist = None
+        self.line = None                    # (slope, intercept): d_ground(v) = slope * v + intercept
+
+    def update(self, disparity):
+        """Fold one frame into the v-disparity histogram and refit the ground line."""
+        sub = disparity[::self.row_step, ::self.col_step]
+        valid = (sub > stereo.VALID_DISP_MIN) & (sub < self.max_disparity)
+        rows, _ = np.nonzero(valid)
+        bins = sub[valid].astype(np.int32)
+        counts = np.bincount(rows * self.max_disparity + bins, minlength=sub.shape[0] * self.max_disparity)
+        counts = counts.reshape(sub.shape[0], self.max_disparity).astype(np.float32)
+
+        if self.hist is None or self.hist.shape != counts.shape:
+            self.hist = counts
+        else:
+            self.hist *= self.decay
+            self.hist += (1 - self.decay) * counts
+        self.line = self._fit()
+        return self.line
+
+    def _fit(self):
+        start = int(self.hist.shape[0] * self.start_fraction)
+        lower = self.hist[start:]
+        peaks = np.argmax(lower, axis=1)
+        votes = lower[np.arange(len(peaks)), peaks]
+        keep = votes >= self.min_votes
+        if np.count_nonzero(keep) < 5:
+            return None
+        v = (np.nonzero(keep)[0] + start) * self.row_step
+        d = peaks[keep].astype(np.float64)
+
+        # Two rounds of least squares, dropping rows where an obstacle out-voted the ground
+        inliers = np.ones(len(v), dtype=bool)
+        for _ in range(2):
+            slope, intercept = np.polyfit(v[inliers], d[inliers], 1)
+            residual = np.abs(d - (slope * v + intercept))
+            inliers = residual <= max(2.0, 2 * np.median(residual))
+            if np.count_nonzero(inliers) < 5:
+                return None
+        slope, intercept = np.polyfit(v[inliers], d[inliers], 1)
+        # Ground disparity must grow towards the bottom of the frame
+        return (slope, intercept) if slope > 0 else None
+
+    def obstacle_mask(self, disparity):
+        """Full-frame boolean mask of pixels that are not ground, or None before a line is found."""
+        if self.line is None:
+            return None
+        slope, intercept = self.line
+        expected = slope * np.arange(disparity.shape[0], dtype=np.float32)[:, None] + intercept
+        tolerance = self.tolerance_px + self.tolerance_ratio * np.maximum(expected, 0)
+        return np.abs(disparity - expected) > tolerance
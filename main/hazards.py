@@ -0,0 +1,219 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+import ble_protocol
+
+# === Time-to-collision hazard engine ===
+# Detections carry no identity between frames, so each one is matched to a short track by
+# label, bearing and predicted distance. A track keeps its last couple of seconds of (fused)
+# distances; the least-squares slope of that history is the closing speed, and distance over
+# closing speed is the time to collision (TTC).
+#
+# Announcements, most urgent first:
+#   imminent  TTC <= imminent_ttc_s, or nearer than imminent_cm and closing: sent on the frame
+#             it is detected, ignoring the text gate (each track at most every repeat_s)
+#   warning   TTC <= warning_ttc_s: once per track, with a short global gap (warning_gap_s)
+#   routine   the old rule: the closest object when its label changes or it is 1 m closer than
+#             at the last announcement, at most every report_interval_s
+# Crosswalks are on the ground, so they never get a TTC and only take part in routine reports.
+#
+# The TF-Luna looks straight ahead, so its reading replaces the stereo distance of the nearest
+# detection within lidar_beam_deg of the optical axis.
+
+NEVER_COLLIDE = {"crosswalk"}
+LEVEL_ROUTINE, LEVEL_WARNING, LEVEL_IMMINENT = "routine", "warning", "imminent"
+
+
+class Track:
+    def __init__(self, track_id, label, bearing_deg, history_s):
+        self.id = track_id
+        self.label = label
+        self.bearing_deg = bearing_deg
+        self.history = deque()          # (timestamp, distance_cm)
+        self.history_s = history_s
+        self.detection = None           # latest detection dict
+        self.closing_cm_s = 0.0
+        self.ttc_s = float("inf")
+        self.last_imminent = float("-inf")     # a routine report must not hold back an imminent one
+        self.warned = False
+
+    @property
+    def distance_cm(self):
+        return self.history[-1][1]
+
+    @property
+    def last_seen(self):
+        return self.history[-1][0]
+
+    def predicted_cm(self, now):
+        return self.distance_cm - self.closing_cm_s * (now - self.last_seen)
+
+    def add(self, now, detection, min_samples, min_span_s, min_closing_cm_s):
+        self.detection = detection
+        self.bearing_deg = detection.get("bearing_deg", 0.0)
+        self.history.append((now, detection["distance_cm"]))
+        while now - self.history[0][0] > self.history_s:
+            self.history.popleft()
+
+        self.closing_cm_s, self.ttc_s = 0.0, float("inf")
+        if len(self.history) < min_samples or now - self.history[0][0] < min_span_s:
+            return
+        # Least-squares slope of distance over time; negative slope = approaching
+        n = len(self.history)
+        mean_t = sum(t for t, _ in self.history) / n
+        mean_d = sum(d for _, d in self.history) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in self.history)
+        if var_t <= 0:
+            return
+        slope = sum((t - mean_t) * (d - mean_d) for t, d in self.history) / var_t
+        self.closing_cm_s = -slope
+        # Stereo noise on a few samples can fake a fast approach; only trust a slope well above
+        # its own standard error
+        residual = sum((d - mean_d - slope * (t - mean_t)) ** 2 for t, d in self.history)
+        slope_error = (residual / max(n - 2, 1) / var_t) ** 0.5
+        if (self.label not in NEVER_COLLIDE and self.closing_cm_s >= min_closing_cm_s
+                and self.closing_cm_s >= 2 * slope_error):
+            self.ttc_s = self.distance_cm / self.closing_cm_s
+
+
+@dataclass
+class Announcement:
+    track: Track
+    level: str
+    message: str
+
+
+class HazardEngine:
+    def __init__(self, history_s=2.0, max_age_s=1.0, bearing_gate_deg=12.0, min_samples=3, min_span_s=0.3,
+                 min_closing_cm_s=20.0, imminent_ttc_s=2.0, imminent_cm=100.0, warning_ttc_s=5.0,
+                 repeat_s=3.0, warning_gap_s=2.0, report_interval_s=5.0, report_step_cm=100.0,
+                 lidar_beam_deg=5.0):
+        self.history_s = history_s
+        self.max_age_s = max_age_s
+        self.bearing_gate_deg = bearing_gate_deg
+        self.min_samples = min_samples
+        self.min_span_s = min_span_s
+        self.min_closing_cm_s = min_closing_cm_s
+        self.imminent_ttc_s = imminent_ttc_s
+        self.imminent_cm = imminent_cm
+        self.warning_ttc_s = warning_ttc_s
+        self.repeat_s = repeat_s
+        self.warning_gap_s = warning_gap_s
+        self.report_interval_s = report_interval_s
+        self.report_step_cm = report_step_cm
+        self.lidar_beam_deg = lidar_beam_deg
+        self.tracks = []
+        self.next_id = 0
+        self.last_sent = float("-inf")
+        self.last_routine_label = None
+        self.last_routine_distance = None
+
+    def fuse_lidar(self, detected, lidar_cm):
+        """Give the LiDAR distance to the nearest detection inside its beam."""
+        if not lidar_cm or lidar_cm <= 0:
+            return
+        centred = [d for d in detected if abs(d.get("bearing_deg", 0.0)) <= self.lidar_beam_deg]
+        if centred:
+            nearest = min(centred, key=lambda d: d["distance_cm"])
+            if abs(nearest["distance_cm"] - lidar_cm) > 100:
+                print(f"LiDAR discrepancy ({lidar_cm} cm vs {nearest['distance_cm']:.0f} cm), using LiDAR.")
+            nearest["distance_cm"] = float(lidar_cm)
+
+    def _match(self, detection, now, taken):
+        best, best_cost = None, None
+        for track in self.tracks:
+            if track.id in taken or track.label != detection["label"]:
+                continue
+            bearing_error = abs(track.bearing_deg - detection.get("bearing_deg", 0.0))
+            predicted = track.predicted_cm(now)
+            distance_error = abs(predicted - detection["distance_cm"])
+            if bearing_error > self.bearing_gate_deg or distance_error > max(150.0, 0.5 * predicted):
+                continue
+            cost = bearing_error / self.bearing_gate_deg + distance_error / max(150.0, 0.5 * predicted)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = track, cost
+        return best
+
+    def update(self, detected, now, lidar_cm=None):
+        """Fold one frame of detection dicts into the tracks.
+
+        Adds "ttc_s", "closing_cm_s" and a TTC-aware "urgency" to each dict, for the binary
+        protocol.
+        """
+        self.fuse_lidar(detected, lidar_cm)
+        taken = set()
+        # Nearest first, so the objects that matter most get first pick of the tracks
+        for detection in sorted(detected, key=lambda d: d["distance_cm"]):
+            track = self._match(detection, now, taken)
+            if track is None:
+                track = Track(self.next_id, detection["label"], detection.get("bearing_deg", 0.0), self.history_s)
+                self.next_id += 1
+                self.tracks.append(track)
+            taken.add(track.id)
+            track.add(now, detection, self.min_samples, self.min_span_s, self.min_closing_cm_s)
+
+            detection["closing_cm_s"] = track.closing_cm_s
+            detection["ttc_s"] = track.ttc_s
+            urgency = ble_protocol.urgency_for(detection["distance_cm"])
+            level = self.level(track)
+            if level == LEVEL_IMMINENT:
+                urgency = ble_protocol.URGENCY_IMMINENT
+            elif level == LEVEL_WARNING:
+                urgency = max(urgency, ble_protocol.URGENCY_HIGH)
+            detection["urgency"] = urgency
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age_s]
+
+    def level(self, track):
+        if track.ttc_s <= self.imminent_ttc_s or (
+                track.distance_cm <= self.imminent_cm and track.closing_cm_s >= self.min_closing_cm_s):
+            return LEVEL_IMMINENT
+        if track.ttc_s <= self.warning_ttc_s:
+            return LEVEL_WARNING
+        return LEVEL_ROUTINE
+
+    def announcement(self, now) -> Optional[Announcement]:
+        """The one announcement due this frame, if any; call mark_sent once it is out."""
+        current = [t for t in self.tracks if t.last_seen == now]
+        if not current:
+            return None
+        by_ttc = sorted(current, key=lambda t: (t.ttc_s, t.distance_cm))
+
+        for track in by_ttc:
+            if self.level(track) == LEVEL_IMMINENT and now - track.last_imminent >= self.repeat_s:
+                return Announcement(track, LEVEL_IMMINENT, self._message(track))
+        for track in by_ttc:
+            if (self.level(track) == LEVEL_WARNING and not track.warned
+                    and now - self.last_sent >= self.warning_gap_s):
+                return Announcement(track, LEVEL_WARNING, self._message(track))
+
+        closest = min(current, key=lambda t: t.distance_cm)
+        changed = (self.last_routine_label != closest.label or
+                   (self.last_routine_distance is not None and
+                    self.last_routine_distance - closest.distance_cm >= self.report_step_cm))
+        if changed and now - self.last_sent >= self.report_interval_s:
+            return Announcement(closest, LEVEL_ROUTINE, self._message(closest))
+        return None
+
+    def mark_sent(self, announcement, now):
+        self.last_sent = now
+        track = announcement.track
+        if announcement.level == LEVEL_IMMINENT:
+            track.last_imminent = now
+        if announcement.level != LEVEL_ROUTINE:
+            track.warned = True
+        self.last_routine_label = track.label
+        self.last_routine_distance = track.distance_cm
+
+    def _message(self, track):
+        direction = track.detection.get("direction", "ahead")
+        message = f"{track.label} {direction}, {track.distance_cm / 100:.1f} meters away"
+        held_s = track.detection.get("held_s")
+        if held_s:
+            # Not measured this frame (a crosswalk on featureless asphalt); the user may be closer now
+            seconds = max(1, round(held_s))
+            message += f" (measured {seconds} second{'s' if seconds > 1 else ''} ago)"
+        if track.ttc_s != float("inf"):
+            seconds = max(1, round(track.ttc_s))
+            message += f", approaching, {seconds} second{'s' if seconds > 1 else ''}"
+        return message
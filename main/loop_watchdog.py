@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import stats
+
+logger = logging.getLogger(__name__)
+
+# === Event-loop lag watchdog ===
+# BLE callbacks and notifications run on the asyncio loop, so anything that blocks it (a capture,
+# a serial read, numpy work that was not moved to a thread) delays them by the same amount.
+#
+# A ticker task sleeps for `interval_s` and records how late it wakes up: that is the loop lag
+# any other callback would have seen. A sampler thread watches the ticker; when it has not
+# ticked for `threshold_s`, it grabs the loop thread's stack with sys._current_frames(), which
+# shows the call that is blocking. Lag percentiles and the blocking stacks go to the log every
+# `report_every_s`, so a run's log shows whether BLE latency stayed within `budget_ms`.
+
+
+class LoopWatchdog:
+    def __init__(self, interval_s=0.05, threshold_s=0.1, window=2000, report_every_s=30.0, budget_ms=100.0):
+        self.interval_s = interval_s
+        self.threshold_s = threshold_s
+        self.report_every_s = report_every_s
+        self.budget_ms = budget_ms
+        self.lags_ms = deque(maxlen=window)
+        self.stalls = deque(maxlen=20)      # (when, blocked for s, stack text)
+        self.last_tick = time.monotonic()
+        self.loop_thread_id = None
+        self.stopped = threading.Event()
+
+    def stats(self):
+        if not self.lags_ms:
+            return None
+        lags = list(self.lags_ms)
+        return {"p50_ms": stats.percentile(lags, 50), "p95_ms": stats.percentile(lags, 95),
+                "p99_ms": stats.percentile(lags, 99), "max_ms": max(lags), "samples": len(lags)}
+
+    def _sample_loop(self):
+        """Sampler thread: capture the loop thread's stack while the ticker is overdue."""
+        sampled_tick = None
+        while not self.stopped.wait(self.threshold_s / 2):
+            tick = self.last_tick
+            blocked_s = time.monotonic() - tick - self.interval_s
+            if blocked_s < self.threshold_s or tick == sampled_tick:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            sampled_tick = tick     # one sample per stall
+            stack = "".join(traceback.format_stack(frame))
+            self.stalls.append((time.time(), blocked_s, stack))
+            logger.warning(f"Event loop blocked for {blocked_s * 1000:.0f} ms so far in:\n{stack}")
+
+    def report(self):
+        stats = self.stats()
+        if stats is None:
+            return
+        message = (f"Loop lag p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+                   f"p99 {stats['p99_ms']:.1f} ms, max {stats['max_ms']:.1f} ms "
+                   f"({stats['samples']} samples, {len(self.stalls)} stalls recorded)")
+        if stats["p99_ms"] > self.budget_ms:
+            logger.warning(f"{message}; p99 over the {self.budget_ms:.0f} ms budget")
+        else:
+            logger.info(message)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        sampler = threading.Thread(target=self._sample_loop, name="loop-watchdog", daemon=True)
+        sampler.start()
+        last_report = loop.time()
+        try:
+            while True:
+                start = loop.time()
+                self.last_tick = time.monotonic()
+                await asyncio.sleep(self.interval_s)
+                now = loop.time()
+                self.lags_ms.append(max(0.0, now - start - self.interval_s) * 1000)
+                if now - last_report >= self.report_every_s:
+                    self.report()
+                    last_report = now
+        finally:
+            self.stopped.set()
@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+import serial
+from libcamera import controls
+from picamera2 import Picamera2
+
+import ble_protocol
+import ble_server
+import buffers
+import commands
+import crosswalk_tracker
+import depth
+import detectors
+import disparity_range
+import ground
+import hazards
+import profiles
+import stereo as stereo_utils
+import stereo_engines
+import visualizers
+
+logger = logging.getLogger(__name__)
+
+# === Runtime pipeline ===
+# The one capture -> detect -> depth -> report loop, built from a profiles.PerformanceProfile.
+# Everything that used to differ between main.py, expov2.py and expov3.py (models, input sizes,
+# SGBM preset, stereo engine, rates, optional stages) is a profile setting; run it with
+#
+#   python main.py --profile balanced
+
+LIDAR_PORT = "/dev/ttyAMA0"
+REPORT_DISTANCE_STEP_CM = 100   # report the same label again only if at least 1 m closer
+REPORT_INTERVAL_S = 5           # minimum gap between text announcements
+
+RECONFIGURE_COMMANDS = (commands.SetProfile, commands.SetResolution, commands.SetSgbmPreset,
+                        commands.SetStereoEngine, commands.SetDetector, commands.SetFrameRate)
+
+
+class Pipeline:
+    def __init__(self, profile: profiles.PerformanceProfile, visualizer=None):
+        print("Initializing cameras...")
+        self.cameras = (Picamera2(0), Picamera2(1))
+        print("Initializing TF-Luna LiDAR...")
+        self.ser = serial.Serial(LIDAR_PORT, 115200)
+        # Headless unless told otherwise: nothing is drawn or polled
+        self.visualizer = visualizer or visualizers.NullVisualizer()
+        self.pool = buffers.FramePool()
+
+        self.profile = None
+        self.pending_profile = None
+        self.rect = self.Q = None
+        self.stereo = None
+        self.range_planner = None
+        self.detector = None
+        self.crosswalk_tracker = None
+        self.ground_plane = ground.GroundPlane()
+
+        self.frame_index = 0
+        self.lidar_temperature = None   # TF-Luna chip temperature, for the governor
+        self.hazards = hazards.HazardEngine(report_interval_s=REPORT_INTERVAL_S,
+                                            report_step_cm=REPORT_DISTANCE_STEP_CM)
+        self.apply_profile(profile)
+
+    # === Configuration ===
+    def apply_profile(self, new_profile):
+        """Switch cameras, stereo engine and detectors to `new_profile`, rebuilding only what changed."""
+        old = self.profile
+
+        def changed(*fields):
+            return old is None or any(getattr(old, f) != getattr(new_profile, f) for f in fields)
+
+        if changed("resolution"):
+            size = new_profile.resolution
+            print(f"Configuring cameras for {size[0]}x{size[1]}...")
+            for camera in self.cameras:
+                camera.stop()
+                # RGB888 is 3-channel BGR in memory, which is what OpenCV and the detectors expect
+                camera.configure(camera.create_preview_configuration(main={"size": size, "format": "RGB888"}))
+                camera.set_controls({"AfMode": controls.AfModeEnum.Continuous})
+                camera.start()
+            self.rect = stereo_utils.load_rectification(size)
+            self.Q = self.rect["Q"]
+        if changed("sgbm_preset", "stereo_engine"):
+            print(f"Stereo engine {new_profile.stereo_engine} ({new_profile.sgbm_preset})")
+            self.stereo = stereo_engines.make_engine(new_profile.stereo_engine, new_profile.sgbm_preset)
+
+        if "objects" not in new_profile.stages:
+            self.detector = None
+        elif self.detector is None or changed("detector", "detector_input_size", "detector_conf", "detector_format"):
+            print(f"Loading YOLO model {new_profile.detector} ({new_profile.detector_format or 'pt'})...")
+            self.detector = detectors.YoloDetector(new_profile.detector, new_profile.detector_input_size,
+                                                   new_profile.detector_conf, new_profile.detector_format)
+        if "crosswalk" not in new_profile.stages:
+            self.crosswalk_tracker = None
+        elif self.crosswalk_tracker is None or changed("crosswalk_model", "crosswalk_input_size", "crosswalk_band",
+                                                       "crosswalk_backend", "crosswalk_threads"):
+            print(f"Loading crosswalk model {new_profile.crosswalk_model} ({new_profile.crosswalk_backend})...")
+            detector = detectors.make_crosswalk_detector(
+                new_profile.crosswalk_backend, new_profile.crosswalk_model, new_profile.crosswalk_input_size,
+                keep_aspect=new_profile.crosswalk_band is not None, threads=new_profile.crosswalk_threads)
+            self.crosswalk_tracker = crosswalk_tracker.CrosswalkTracker(detector, new_profile.crosswalk_band)
+        if self.crosswalk_tracker is not None:
+            self.crosswalk_tracker.every = new_profile.crosswalk_every
+            self.crosswalk_tracker.half_life_s = new_profile.crosswalk_half_life_s
+            if changed("resolution"):
+                self.crosswalk_tracker.clear()
+
+        # Q or the full range may have changed; start again from a full-range search
+        self.range_planner = disparity_range.RangePlanner(self.Q, self.stereo.num_disparities)
+        self.stereo.reset_range()
+        self.profile = new_profile
+        print(f"Profile '{new_profile.name}' active: {new_profile}")
+
+    def register_commands(self, dispatcher: commands.CommandDispatcher):
+        for command_type in RECONFIGURE_COMMANDS:
+            dispatcher.register(command_type, self.reconfigure)
+
+    async def reconfigure(self, command):
+        """BLE reconfiguration; the new profile is applied between frames by `run`."""
+        base = self.pending_profile or self.profile
+        if isinstance(command, commands.SetProfile):
+            if command.name not in profiles.PROFILES:
+                print(f"Unknown profile '{command.name}', ignoring.")
+                return
+            self.pending_profile = profiles.PROFILES[command.name]
+        elif isinstance(command, commands.SetResolution):
+            if command.size not in profiles.ALLOWED_RESOLUTIONS:
+                print(f"Unsupported resolution {command.size[0]}x{command.size[1]}, ignoring.")
+                return
+            self.pending_profile = base.with_changes(resolution=command.size)
+        elif isinstance(command, commands.SetSgbmPreset):
+            if command.preset not in profiles.SGBM_PRESETS:
+                print(f"Unknown SGBM preset '{command.preset}', ignoring.")
+                return
+            self.pending_profile = base.with_changes(sgbm_preset=command.preset)
+        elif isinstance(command, commands.SetStereoEngine):
+            if command.engine not in stereo_engines.ENGINES:
+                print(f"Unknown stereo engine '{command.engine}', ignoring.")
+                return
+            self.pending_profile = base.with_changes(stereo_engine=command.engine)
+        elif isinstance(command, commands.SetDetector):
+            if command.weights not in profiles.ALLOWED_DETECTORS:
+                print(f"Unknown detector '{command.weights}', ignoring.")
+                return
+            self.pending_profile = base.with_changes(detector=command.weights)
+        elif isinstance(command, commands.SetFrameRate):
+            self.pending_profile = base.with_changes(fps=max(command.fps, 0))
+
+    # === Stages ===
+    def read_lidar(self):
+        if self.ser.in_waiting > 8:
+            bytes_serial = self.ser.read(9)
+            self.ser.reset_input_buffer()
+            if bytes_serial[0] == 0x59 and bytes_serial[1] == 0x59:
+                distance = bytes_serial[2] + bytes_serial[3] * 256
+                strength = bytes_serial[4] + bytes_serial[5] * 256
+                temperature = (bytes_serial[6] + bytes_serial[7] * 256) / 8.0 - 256.0
+                return {"distance": distance, "strength": strength, "temperature": temperature}
+        return None
+
+    def acquire(self):
+        """Capture both cameras and rectify straight out of their request buffers.
+
+        Returns the rectified colour left and both rectified grays, all pool buffers; the camera
+        buffers are handed back before this returns.
+        """
+        with buffers.captured_pair(self.cameras) as (rawL, rawR):
+            return stereo_utils.rectify_into(self.rect, rawL, rawR, self.pool)
+
+    def detect_objects(self, imgL):
+        if self.detector is None:
+            return []
+        return self.detector.detect(imgL)
+
+    def detect_crosswalks(self, imgL):
+        if self.crosswalk_tracker is None:
+            return []
+        return self.crosswalk_tracker.update(imgL, self.frame_index, time.time())
+
+    def locate(self, disparity, objects, crosswalks):
+        """Distance, direction and bearing for every detection, or the nearest obstacle if there are none."""
+        stages = self.profile.stages
+        # One sector map per frame: direction lookups and the spatial summary come from it
+        roi = depth.matcher_roi(self.rect["roiL"], self.stereo.num_disparities, self.stereo.block_size)
+        if "adaptive_range" in stages:
+            self.range_planner.observe(disparity, roi)
+        # Ground pixels are left out of the obstacle search and object medians (not crosswalks,
+        # which lie on the ground)
+        above_ground = None
+        if "ground" in stages:
+            self.ground_plane.update(disparity)
+            above_ground = self.ground_plane.obstacle_mask(disparity)
+        sectors = depth.sector_map(disparity, roi, self.Q, mask=above_ground)
+        print(f"Sectors: {sectors.summary()}")
+
+        def entry(label, distance_cm, center_x, **extra):
+            return {
+                "label": label,
+                "distance_cm": float(distance_cm),
+                "direction": sectors.direction_for_x(center_x),
+                "bearing_deg": sectors.bearing_for_x(center_x),
+                **extra,
+            }
+
+        # Median disparity for every box in one call per mask; depth only depends on disparity
+        cw_disp, _ = depth.box_disparity_stats(disparity, crosswalks)
+        obj_disp, _ = depth.box_disparity_stats(disparity, objects, mask=above_ground)
+        with np.errstate(invalid="ignore"):
+            cw_dist = stereo_utils.disparity_to_cm(cw_disp, self.Q)
+            obj_dist = stereo_utils.disparity_to_cm(obj_disp, self.Q)
+
+        detected = []
+        # Held crosswalks keep their last good distance when the road surface gives no disparity;
+        # "held_s" is its age, so the announcement can say it is not a fresh measurement
+        now = time.time()
+        tracked = self.crosswalk_tracker.crosswalks if self.crosswalk_tracker else []
+        for crosswalk, (x1, y1, x2, y2, conf), median_disp, distance_cm in zip(tracked, crosswalks, cw_disp, cw_dist):
+            if median_disp > 0:
+                crosswalk.distance_cm, crosswalk.measured_at = float(distance_cm), now
+            if crosswalk.distance_cm is not None:
+                held = {} if crosswalk.measured_at == now else {"held_s": now - crosswalk.measured_at}
+                detected.append(entry("crosswalk", crosswalk.distance_cm, (x1 + x2) // 2, **held))
+        for (x1, y1, x2, y2, conf, label), median_disp, distance_cm in zip(objects, obj_disp, obj_dist):
+            if median_disp > 0 and 0 < distance_cm < 10000:
+                detected.append(entry(label, distance_cm, (x1 + x2) // 2))
+
+        if not detected:
+            print("No detections, searching disparity for the nearest obstacle...")
+            distance_cm, _, _ = sectors.nearest()
+            if sectors.nearest_point is not None and 0 < distance_cm < 5000:
+                detected.append(entry("obstacle", distance_cm, sectors.nearest_point[0]))
+        return detected
+
+    async def report(self, server: ble_server.SafePiBLEServer, detected, lidar_data):
+        now = time.time()
+        lidar_cm = lidar_data["distance"] if lidar_data and "lidar" in self.profile.stages else None
+        self.hazards.update(detected, now, lidar_cm)
+        detected.sort(key=lambda x: x["distance_cm"])
+
+        # Binary clients get the whole top-N list every frame, urgency raised by TTC; text clients
+        # get the announcement the hazard engine picks
+        if detected and server.protocol_version == ble_protocol.PROTOCOL_BINARY_V1:
+            await server.send_hazards(detected)
+
+        announcement = self.hazards.announcement(now)
+        if announcement is None:
+            if detected:
+                closest = detected[0]
+                print(f"→ {closest['label']} @ {closest['distance_cm']:.1f} cm (not reported)")
+            return
+        print(f"→ {announcement.level}: {announcement.message}")
+        if server.protocol_version == ble_protocol.PROTOCOL_TEXT:
+            await server.send_message(announcement.message)
+        self.hazards.mark_sent(announcement, now)
+
+    # === Loop ===
+    # Anything that can take more than a millisecond or two (capture, serial, OpenCV, numpy,
+    # visualisation) runs in a worker thread, so BLE callbacks on the loop are never held up for a
+    # whole frame; visualizer.poll() only reads a flag. loop_watchdog.py reports when something
+    # slips through.
+    async def step(self, server: ble_server.SafePiBLEServer):
+        """Capture and process one frame."""
+        print(f"\n--- Frame {self.frame_index} ---")
+        # Everything downstream works in rectified left coordinates, so boxes line up with the
+        # disparity. The LiDAR is read before stereo runs so it can prime this frame's disparity search.
+        (imgL, grayL, grayR), lidar_data = await asyncio.gather(
+            asyncio.to_thread(self.acquire),
+            asyncio.to_thread(self.read_lidar),
+        )
+        if lidar_data:
+            self.lidar_temperature = lidar_data["temperature"]
+        if "adaptive_range" in self.profile.stages:
+            if lidar_data:
+                self.range_planner.add_lidar(lidar_data["distance"], lidar_data["strength"])
+            self.stereo.set_range(*self.range_planner.plan())
+
+        objects, disparity, crosswalks = await asyncio.gather(
+            asyncio.to_thread(self.detect_objects, imgL),
+            asyncio.to_thread(self.stereo.compute, grayL, grayR),
+            asyncio.to_thread(self.detect_crosswalks, imgL),
+        )
+
+        detected = await asyncio.to_thread(self.locate, disparity, objects, crosswalks)
+        await self.report(server, detected, lidar_data)
+        if self.visualizer.wants(time.time()):
+            await asyncio.to_thread(self.visualizer.render, imgL, disparity, objects, crosswalks, detected)
+        self.frame_index += 1
+
+    async def switch_profile(self, new_profile):
+        """Apply `new_profile`; if that fails, log it and rebuild the previous profile instead."""
+        previous = self.profile
+        try:
+            await asyncio.to_thread(self.apply_profile, new_profile)
+        except Exception:
+            logger.exception(f"Could not apply profile {new_profile}; keeping '{previous.name}'")
+            # It may have failed half way: rebuild everything for the previous profile
+            self.profile = None
+            await asyncio.to_thread(self.apply_profile, previous)
+
+    async def run(self, server: ble_server.SafePiBLEServer, max_frames=None):
+        while max_frames is None or self.frame_index < max_frames:
+            if self.pending_profile is not None:
+                next_profile, self.pending_profile = self.pending_profile, None
+                await self.switch_profile(next_profile)
+
+            frame_start = time.time()
+            await self.step(server)
+            if not self.visualizer.poll():
+                break
+            if self.profile.fps > 0:
+                await asyncio.sleep(max(0.0, 1.0 / self.profile.fps - (time.time() - frame_start)))
+            else:
+                await asyncio.sleep(0)
+
+    def close(self):
+        for camera in self.cameras:
+            camera.stop()
+        self.ser.close()
+        self.visualizer.close()
+        print("Cameras and LiDAR stopped.")
@@ -0,0 +1,276 @@
+import argparse
+import csv
+import json
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import detectors
+import profiles
+import sessions
+import stereo
+import stereo_engines
+
+# === Accuracy vs latency harness ===
+# Runs every preset over a labelled image set (detectors) or recorded stereo sessions (SGBM)
+# and prints accuracy next to latency and peak memory, marking the Pareto-optimal presets.
+# Each preset runs in a fresh process so its peak RSS is its own.
+#
+# Labelled set layout (YOLO txt convention):
+#   dataset/images/*.jpg   dataset/labels/<stem>.txt  ("class cx cy w h", normalised)
+#   dataset/classes.txt    one class name per line, e.g. "person", ..., "crosswalk"
+#
+#   python preset_eval.py --dataset ../Images/labelled --sessions sessions/* --csv pareto.csv
+
+DETECTOR_PRESETS = {
+    "yolo11n-320-c0.7": {"kind": "yolo", "weights": "yolo11n.pt", "input_size": 320, "conf": 0.7},
+    "yolo11n-320-c0.4": {"kind": "yolo", "weights": "yolo11n.pt", "input_size": 320, "conf": 0.4},
+    "yolo11n-full-c0.7": {"kind": "yolo", "weights": "yolo11n.pt", "input_size": None, "conf": 0.7},
+    "yolo11s-320-c0.7": {"kind": "yolo", "weights": "yolo11s.pt", "input_size": 320, "conf": 0.7},
+    "yolo11s-full-c0.7": {"kind": "yolo", "weights": "yolo11s.pt", "input_size": None, "conf": 0.7},
+    "crosswalk-512": {"kind": "crosswalk", "weights": detectors.CROSSWALK_MODEL_PATH, "input_size": 512, "conf": 0.3},
+    "crosswalk-320": {"kind": "crosswalk", "weights": detectors.CROSSWALK_MODEL_PATH, "input_size": 320, "conf": 0.3},
+}
+
+IOU_THRESHOLD = 0.5
+LIDAR_WINDOW = 9  # half-size in pixels of the centre window compared against the TF-Luna
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# === Labelled images ===
+def load_dataset(path):
+    path = Path(path)
+    classes = (path / "classes.txt").read_text().split("\n")
+    classes = [c.strip() for c in classes if c.strip()]
+    samples = []
+    for img_path in sorted((path / "images").glob("*.jp*g")) + sorted((path / "images").glob("*.png")):
+        img = cv2.imread(str(img_path))
+        if img is None:
+            print(f"Could not read {img_path}, skipping.")
+            continue
+        h, w = img.shape[:2]
+        boxes = []
+        label_path = path / "labels" / f"{img_path.stem}.txt"
+        if label_path.exists():
+            for line in label_path.read_text().splitlines():
+                if not line.strip():
+                    continue
+                cls, cx, cy, bw, bh = line.split()[:5]
+                cx, cy, bw, bh = float(cx) * w, float(cy) * h, float(bw) * w, float(bh) * h
+                boxes.append((classes[int(cls)], cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2))
+        samples.append((img, boxes))
+    return samples
+
+
+def iou(box, others):
+    """IoU between one (x1, y1, x2, y2) box and an (N, 4) array."""
+    if len(others) == 0:
+        return np.zeros(0)
+    others = np.asarray(others, dtype=np.float64)
+    ix1 = np.maximum(box[0], others[:, 0])
+    iy1 = np.maximum(box[1], others[:, 1])
+    ix2 = np.minimum(box[2], others[:, 2])
+    iy2 = np.minimum(box[3], others[:, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (others[:, 2] - others[:, 0]) * (others[:, 3] - others[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def average_precision(detections, ground_truth):
+    """AP@0.5 and recall for one class. detections: [(image, conf, box)], ground_truth: {image: [box]}"""
+    gt = {i: np.asarray(boxes) for i, boxes in ground_truth.items()}
+    n_gt = sum(len(b) for b in gt.values())
+    if n_gt == 0:
+        return None, None
+    matched = {i: np.zeros(len(b), dtype=bool) for i, b in gt.items()}
+    tp = []
+    for image, _conf, box in sorted(detections, key=lambda d: -d[1]):
+        overlaps = iou(box, gt.get(image, []))
+        best = int(np.argmax(overlaps)) if len(overlaps) else -1
+        if best >= 0 and overlaps[best] >= IOU_THRESHOLD and not matched[image][best]:
+            matched[image][best] = True
+            tp.append(1)
+        else:
+            tp.append(0)
+    tp = np.asarray(tp, dtype=np.float64)
+    if len(tp) == 0:
+        return 0.0, 0.0
+    tp_cum = np.cumsum(tp)
+    recall = tp_cum / n_gt
+    precision = tp_cum / np.arange(1, len(tp) + 1)
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.maximum.accumulate(mpre[::-1])[::-1]
+    ap = float(np.sum((mrec[1:] - mrec[:-1]) * mpre[1:]))
+    return ap, float(recall[-1])
+
+
+def eval_detector(name, preset, dataset_path):
+    samples = load_dataset(dataset_path)
+    if preset["kind"] == "yolo":
+        detector = detectors.YoloDetector(preset["weights"], preset["input_size"], preset["conf"])
+        detectable = set(detector.names.values())
+    else:
+        detector = detectors.CrosswalkDetector(preset["weights"], preset["input_size"], preset["conf"])
+        detectable = {"crosswalk"}
+
+    per_class_dets, per_class_gt, latencies = {}, {}, []
+    for index, (img, gt_boxes) in enumerate(samples):
+        for label, *box in gt_boxes:
+            if label in detectable:
+                per_class_gt.setdefault(label, {}).setdefault(index, []).append(box)
+        start = time.perf_counter()
+        if preset["kind"] == "yolo":
+            boxes = detector.detect(img)
+        else:
+            boxes = [(x1, y1, x2, y2, conf, "crosswalk") for x1, y1, x2, y2, conf in detector.detect(img)]
+        latencies.append((time.perf_counter() - start) * 1000)
+        for x1, y1, x2, y2, conf, label in boxes:
+            per_class_dets.setdefault(label, []).append((index, conf, (x1, y1, x2, y2)))
+
+    aps, recalls = [], []
+    for label, gt in per_class_gt.items():
+        ap, recall = average_precision(per_class_dets.get(label, []), gt)
+        if ap is not None:
+            aps.append(ap)
+            recalls.append(recall)
+    return {
+        "preset": name, "kind": preset["kind"],
+        "accuracy": float(np.mean(aps)) if aps else float("nan"), "accuracy_metric": "mAP50",
+        "recall": float(np.mean(recalls)) if recalls else float("nan"),
+        "latency_ms": float(np.mean(latencies)), "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# === Stereo sessions ===
+def measure_stereo(engine, frames):
+    """Density, LiDAR distance error and compute time of a stereo engine over sessions.load_rectified frames."""
+    errors, densities, latencies = [], [], []
+    for frame in frames:
+        rect = frame["rect"]
+        x, y, w, h = rect["roiL"]
+        cx, cy = rect["size"][0] // 2, rect["size"][1] // 2
+        start = time.perf_counter()
+        disparity = engine.compute(frame["grayL"], frame["grayR"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        roi = disparity[y:y + h, x:x + w]
+        densities.append(float(np.mean((roi > stereo.VALID_DISP_MIN) & (roi < stereo.VALID_DISP_MAX))))
+        if frame["lidar_cm"] is None:
+            continue
+        window = disparity[cy - LIDAR_WINDOW:cy + LIDAR_WINDOW + 1, cx - LIDAR_WINDOW:cx + LIDAR_WINDOW + 1]
+        valid = window[(window > stereo.VALID_DISP_MIN) & (window < stereo.VALID_DISP_MAX)]
+        if valid.size == 0:
+            continue
+        distance_cm = float(stereo.disparity_to_cm(np.median(valid), rect["Q"]))
+        errors.append(abs(distance_cm - frame["lidar_cm"]))
+    return {
+        "distance_mae_cm": float(np.mean(errors)) if errors else float("nan"),
+        "lidar_frames": len(errors),
+        "density": float(np.mean(densities)) if densities else float("nan"),
+        "latency_ms": float(np.mean(latencies)) if latencies else float("nan"),
+        "latency_p95_ms": float(np.percentile(latencies, 95)) if latencies else float("nan"),
+    }
+
+
+def eval_stereo(name, session_paths, engine="sgbm"):
+    metrics = measure_stereo(stereo_engines.make_engine(engine, name), sessions.load_rectified(session_paths))
+    return {
+        "preset": f"{engine}/{name}", "kind": engine,
+        "accuracy": metrics["distance_mae_cm"], "accuracy_metric": "distance MAE cm",
+        "recall": metrics["density"],
+        "latency_ms": metrics["latency_ms"], "latency_p95_ms": metrics["latency_p95_ms"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def mark_pareto(rows, higher_is_better):
+    """Flag rows that no other row beats on both accuracy and latency."""
+    for row in rows:
+        acc, lat = row["accuracy"], row["latency_ms"]
+        row["pareto"] = not any(
+            (other["accuracy"] >= acc if higher_is_better else other["accuracy"] <= acc)
+            and other["latency_ms"] <= lat
+            and (other["accuracy"] != acc or other["latency_ms"] != lat)
+            for other in rows if other is not row
+        ) and not np.isnan(acc)
+
+
+def run_isolated(fn, *args):
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy vs latency for detector and SGBM presets")
+    parser.add_argument("--dataset", help="labelled image set for detector presets")
+    parser.add_argument("--sessions", nargs="*", default=[], help="recorded stereo sessions for SGBM presets")
+    parser.add_argument("--detector-presets", default=",".join(DETECTOR_PRESETS))
+    parser.add_argument("--sgbm-presets", default=",".join(profiles.SGBM_PRESETS))
+    parser.add_argument("--stereo-engines", default="sgbm", help=f"any of {','.join(stereo_engines.ENGINES)}")
+    parser.add_argument("--presets-json", help="extra detector presets, same shape as DETECTOR_PRESETS")
+    parser.add_argument("--csv", help="also write the table to this file")
+    args = parser.parse_args()
+
+    detector_presets = dict(DETECTOR_PRESETS)
+    if args.presets_json:
+        with open(args.presets_json) as f:
+            detector_presets.update(json.load(f))
+
+    groups = []
+    if args.dataset:
+        rows = []
+        for name in args.detector_presets.split(","):
+            print(f"Evaluating detector preset {name}...")
+            try:
+                rows.append(run_isolated(eval_detector, name, detector_presets[name], args.dataset))
+            except Exception as e:
+                print(f"  {name} failed: {e}")
+        for kind in ("yolo", "crosswalk"):
+            kind_rows = [r for r in rows if r["kind"] == kind]
+            mark_pareto(kind_rows, higher_is_better=True)
+            groups.append(kind_rows)
+    if args.sessions:
+        rows = []
+        for engine in args.stereo_engines.split(","):
+            for name in args.sgbm_presets.split(","):
+                print(f"Evaluating {engine} with SGBM preset {name}...")
+                try:
+                    rows.append(run_isolated(eval_stereo, name, args.sessions, engine))
+                except Exception as e:
+                    print(f"  {engine}/{name} failed: {e}")
+        mark_pareto(rows, higher_is_better=False)
+        groups.append(rows)
+
+    all_rows = [row for group in groups for row in group]
+    if not all_rows:
+        print("Nothing to evaluate: pass --dataset and/or --sessions.")
+        return
+
+    print(f"\n{'preset':<20} {'metric':<16} {'accuracy':>9} {'recall/density':>15} "
+          f"{'ms':>8} {'p95 ms':>8} {'RSS MB':>8}  pareto")
+    for group in groups:
+        for row in sorted(group, key=lambda r: r["latency_ms"]):
+            print(f"{row['preset']:<20} {row['accuracy_metric']:<16} {row['accuracy']:9.3f} {row['recall']:15.3f} "
+                  f"{row['latency_ms']:8.1f} {row['latency_p95_ms']:8.1f} {row['peak_rss_mb']:8.0f}  "
+                  f"{'*' if row['pareto'] else ''}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(all_rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(all_rows)
+        print(f"\nWrote {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import re
+import subprocess
+import threading
+import time
+
+import ble_fake
+import ble_server
+import profiles
+from pipeline import Pipeline
+
+# === Profile FPS / power measurement ===
+# Runs the real pipeline (cameras, models, LiDAR) on the device for each profile, with a fake
+# BLE server so no phone is needed, and writes the results to profiles.MEASUREMENTS_PATH.
+# profiles.py loads that file, so `main.py --list-profiles` shows the numbers of this build.
+#
+#   python profile_bench.py --frames 200
+#
+# Power comes from the Raspberry Pi 5 PMIC (`vcgencmd pmic_read_adc`): the sum of the board
+# rails, which leaves out USB devices such as the cameras' hubs. It is None on boards without it.
+
+PMIC_LINE = re.compile(r"(\S+)_([AV]) (?:current|volt)\(\d+\)=([\d.]+)")
+
+
+def read_board_power_w():
+    try:
+        output = subprocess.run(["vcgencmd", "pmic_read_adc"], capture_output=True, text=True,
+                                timeout=2).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    amps, volts = {}, {}
+    for rail, kind, value in PMIC_LINE.findall(output):
+        (amps if kind == "A" else volts)[rail] = float(value)
+    if not amps:
+        return None
+    return sum(amps[rail] * volts[rail] for rail in amps if rail in volts)
+
+
+class PowerSampler(threading.Thread):
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.running = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            if self.running.is_set():
+                power = read_board_power_w()
+                if power is not None:
+                    self.samples.append(power)
+            time.sleep(self.interval)
+
+    def measure(self):
+        self.samples = []
+        self.running.set()
+
+    def result(self):
+        self.running.clear()
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+
+async def measure(names, frames, warmup):
+    loop = asyncio.get_running_loop()
+    server = ble_server.SafePiBLEServer(loop, server_factory=ble_fake.FakeBlessServer)
+    await server.start()
+    pipeline = Pipeline(profiles.PROFILES[names[0]])
+    sampler = PowerSampler()
+    sampler.start()
+    results = {}
+    try:
+        for name in names:
+            pipeline.apply_profile(profiles.PROFILES[name])
+            pipeline.frame_index = 0
+            await pipeline.run(server, max_frames=warmup)
+
+            sampler.measure()
+            start = time.perf_counter()
+            await pipeline.run(server, max_frames=warmup + frames)
+            fps = frames / (time.perf_counter() - start)
+            power_w = sampler.result()
+            results[name] = {"fps": round(fps, 2), "power_w": None if power_w is None else round(power_w, 2),
+                             "frames": frames, "date": time.strftime("%Y-%m-%d")}
+            print(f"{name}: {fps:.2f} FPS, {'n/a' if power_w is None else f'{power_w:.2f}'} W")
+    finally:
+        sampler.stopped.set()
+        pipeline.close()
+        await server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure FPS and power of each performance profile")
+    parser.add_argument("--profiles", default=",".join(profiles.PROFILES))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", default=profiles.MEASUREMENTS_PATH)
+    args = parser.parse_args()
+
+    results = asyncio.run(measure(args.profiles.split(","), args.frames, args.warmup))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
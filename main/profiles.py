@@ -0,0 +1,156 @@
+import json
+import os
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+
+import cv2
+
+import artifacts
+import detectors
+
+# === SGBM presets ===
+# Collected from the old runtime scripts (main.py, expov2.py, expov3.py).
+SGBM_PRESETS = {
+    # expov3: numDisparities was 16*7, speckleWindowSize reduced from 100
+    "fast": dict(numDisparities=16 * 4, blockSize=5, speckleWindowSize=50,
+                 mode=cv2.STEREO_SGBM_MODE_SGBM),
+    # expov2
+    "balanced": dict(numDisparities=16 * 7, blockSize=5, speckleWindowSize=100,
+                     mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY),
+    # main.py / Sensors/depthMap.py: more disparities, smaller blocks
+    "detailed": dict(numDisparities=16 * 8, blockSize=3, speckleWindowSize=100,
+                     mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY),
+}
+
+
+# sgbm_autotune.py writes its pick here; it is registered as the "tuned" preset and adopted
+# by the profiles listed in the file
+TUNED_PRESET_PATH = "sgbm_preset.json"
+# profile_bench.py writes measured FPS and power per profile here. None is committed yet: the
+# profiles still have to be benchmarked on the Pi, and until then --list-profiles shows every
+# profile as "not measured" rather than guessed numbers.
+MEASUREMENTS_PATH = "profile_measurements.json"
+
+
+def create_sgbm(preset):
+    """StereoSGBM for a preset name or a parameter dict shaped like SGBM_PRESETS values."""
+    params = SGBM_PRESETS[preset] if isinstance(preset, str) else preset
+    return cv2.StereoSGBM_create(
+        minDisparity=0,
+        numDisparities=params["numDisparities"],
+        blockSize=params["blockSize"],
+        P1=params.get("P1", 8 * 3 * 3 ** 2),
+        P2=params.get("P2", 32 * 3 * 3 ** 2),
+        disp12MaxDiff=1,
+        uniquenessRatio=10,
+        speckleWindowSize=params["speckleWindowSize"],
+        speckleRange=2,
+        preFilterCap=63,
+        mode=params["mode"],
+    )
+
+
+# === Performance profiles ===
+# A profile declares the whole runtime pipeline (see pipeline.py): which stages run, the models
+# and their input sizes, the stereo engine and the rates. Stages:
+#   objects         YOLO objects, distance from the box median disparity
+#   crosswalk       crosswalk ONNX model, every `crosswalk_every` frames, on the rows below
+#                   `crosswalk_band` (None = full frame); held and decayed in between
+#                   (crosswalk_tracker.py)
+#   ground          v-disparity ground removal before the obstacle search (ground.py)
+#   adaptive_range  LiDAR-primed disparity search window (disparity_range.py)
+#   lidar           TF-Luna override of the closest distance
+STAGES = ("objects", "crosswalk", "ground", "adaptive_range", "lidar")
+
+
+@dataclass(frozen=True)
+class PerformanceProfile:
+    name: str
+    resolution: Tuple[int, int]   # (width, height) of both cameras
+    sgbm_preset: str              # key into SGBM_PRESETS
+    detector: str                 # YOLO weights
+    fps: float                    # target frame rate, 0 = as fast as possible
+    stereo_engine: str = "sgbm"   # key into stereo_engines.ENGINES
+    stages: Tuple[str, ...] = STAGES
+    detector_input_size: Optional[int] = 320    # None = full frame
+    detector_conf: float = 0.7
+    # artifacts.YOLO_EXPORT_FORMATS, None = .pt weights. Exports have a fixed square input, so only
+    # profiles with a detector_input_size opt in
+    detector_format: Optional[str] = None
+    crosswalk_model: str = detectors.CROSSWALK_MODEL_PATH
+    crosswalk_input_size: int = detectors.CROSSWALK_INPUT_SIZE
+    crosswalk_every: int = 1
+    crosswalk_band: Optional[float] = None      # top of the searched band, fraction of the height
+    crosswalk_half_life_s: float = 2.0
+    crosswalk_backend: str = "dnn"              # key into detectors.CROSSWALK_BACKENDS
+    crosswalk_threads: int = detectors.CROSSWALK_ORT_THREADS    # intra-op threads ("ort" only)
+    # Filled from MEASUREMENTS_PATH (written by profile_bench.py on the device); None = not measured
+    measured_fps: Optional[float] = None
+    measured_power_w: Optional[float] = None
+
+    def __post_init__(self):
+        unknown = set(self.stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages {sorted(unknown)}; choose from {', '.join(STAGES)}")
+        if self.detector_format is not None and self.detector_format not in artifacts.YOLO_EXPORT_FORMATS:
+            raise ValueError(f"Unknown detector format '{self.detector_format}'; "
+                             f"choose from {', '.join(artifacts.YOLO_EXPORT_FORMATS)} or None")
+        if self.crosswalk_backend not in detectors.CROSSWALK_BACKENDS:
+            raise ValueError(f"Unknown crosswalk backend '{self.crosswalk_backend}'; "
+                             f"choose from {', '.join(detectors.CROSSWALK_BACKENDS)}")
+
+    def with_changes(self, **changes) -> "PerformanceProfile":
+        """Copy of this profile with some settings overridden (name becomes "custom")."""
+        return replace(self, name="custom", measured_fps=None, measured_power_w=None, **changes)
+
+
+PROFILES = {
+    # main.py: the small model on full frames with the detailed matcher
+    "max-accuracy": PerformanceProfile("max-accuracy", (640, 480), "detailed", "yolo11s.pt", 0,
+                                       detector_input_size=None),
+    # expov3, with the crosswalk net on the lower half of the frame every third frame
+    "balanced": PerformanceProfile("balanced", (640, 480), "fast", "yolo11n.pt", 0,
+                                   detector_format="torchscript", crosswalk_every=3, crosswalk_band=0.5),
+    # Cheaper matcher, smaller detector input, capped rate, crosswalk net about once a second
+    "reduced": PerformanceProfile("reduced", (640, 480), "fast", "yolo11n.pt", 5, "bm-half",
+                                  detector_input_size=256, detector_format="torchscript",
+                                  crosswalk_every=5, crosswalk_band=0.5),
+    # Half-resolution block matching: coarser depth, several times cheaper than SGBM
+    "battery": PerformanceProfile("battery", (320, 240), "fast", "yolo11n.pt", 2, "bm-half",
+                                  detector_format="torchscript", crosswalk_every=3, crosswalk_band=0.5,
+                                  crosswalk_half_life_s=3.0),
+}
+DEFAULT_PROFILE = "balanced"
+# Most to least expensive; governor.py steps down this ladder as the device heats up
+THERMAL_LADDER = ("max-accuracy", "balanced", "reduced", "battery")
+# What BLE clients may ask for with "set resolution" / "set detector": only sizes the cameras are
+# calibrated and tested at, and only the shipped weights (a .pt file is a pickle, so loading an
+# arbitrary one runs arbitrary code)
+ALLOWED_RESOLUTIONS = frozenset(p.resolution for p in PROFILES.values())
+ALLOWED_DETECTORS = frozenset(p.detector for p in PROFILES.values())
+
+
+def load_tuned_preset(path=TUNED_PRESET_PATH):
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        tuned = json.load(f)
+    SGBM_PRESETS["tuned"] = tuned["params"]
+    for name in tuned.get("profiles", []):
+        if name in PROFILES:
+            PROFILES[name] = replace(PROFILES[name], sgbm_preset="tuned")
+
+
+def load_measurements(path=MEASUREMENTS_PATH):
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        measurements = json.load(f)
+    for name, measured in measurements.items():
+        if name in PROFILES:
+            PROFILES[name] = replace(PROFILES[name], measured_fps=measured.get("fps"),
+                                     measured_power_w=measured.get("power_w"))
+
+
+load_tuned_preset()
+load_measurements()
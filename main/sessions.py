@@ -0,0 +1,128 @@
+import argparse
+import csv
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import cv2
+
+import stereo
+
+# === Recorded stereo sessions ===
+# A session is a directory of raw (unrectified) pairs plus the LiDAR reading taken with them:
+#
+#   session/meta.json        {"resolution": [w, h], "calibration": "stereo_calib_data.npz"}
+#   session/frames.csv       index,timestamp,lidar_cm      (lidar_cm empty when no reading)
+#   session/left/000000.png  session/right/000000.png      lossless, as captured
+#
+# Used as ground truth by preset_eval.py and the SGBM autotuner.
+
+
+class SessionWriter:
+    def __init__(self, path, resolution, calibration="stereo_calib_data.npz"):
+        self.path = Path(path)
+        (self.path / "left").mkdir(parents=True, exist_ok=True)
+        (self.path / "right").mkdir(parents=True, exist_ok=True)
+        with open(self.path / "meta.json", "w") as f:
+            json.dump({"resolution": list(resolution), "calibration": calibration}, f)
+        self.index_file = open(self.path / "frames.csv", "w", newline="")
+        self.index = csv.writer(self.index_file)
+        self.index.writerow(["index", "timestamp", "lidar_cm"])
+        self.count = 0
+
+    def add(self, imgL, imgR, lidar_cm: Optional[float], timestamp: Optional[float] = None):
+        name = f"{self.count:06d}.png"
+        cv2.imwrite(str(self.path / "left" / name), imgL)
+        cv2.imwrite(str(self.path / "right" / name), imgR)
+        self.index.writerow([self.count, timestamp or time.time(), "" if lidar_cm is None else lidar_cm])
+        self.count += 1
+
+    def close(self):
+        self.index_file.close()
+
+
+def load_meta(path) -> dict:
+    with open(Path(path) / "meta.json") as f:
+        return json.load(f)
+
+
+def iter_session(path) -> Iterator[dict]:
+    """Yield {"index", "timestamp", "lidar_cm", "left", "right"} for every frame of a session."""
+    path = Path(path)
+    with open(path / "frames.csv", newline="") as f:
+        for row in csv.DictReader(f):
+            name = f"{int(row['index']):06d}.png"
+            yield {
+                "index": int(row["index"]),
+                "timestamp": float(row["timestamp"]),
+                "lidar_cm": float(row["lidar_cm"]) if row["lidar_cm"] else None,
+                "left": cv2.imread(str(path / "left" / name)),
+                "right": cv2.imread(str(path / "right" / name)),
+            }
+
+
+def load_rectified(session_paths):
+    """Rectified grayscale pairs of several sessions, held in memory for repeated matcher runs.
+
+    Each item is {"grayL", "grayR", "lidar_cm", "rect"} where rect comes from stereo.load_rectification.
+    """
+    frames = []
+    for session_path in session_paths:
+        meta = load_meta(session_path)
+        # A calibration copied into the session wins over the one in the working directory
+        calib_path = Path(session_path) / meta["calibration"]
+        rect = stereo.load_rectification(tuple(meta["resolution"]),
+                                         calib_path=str(calib_path) if calib_path.exists() else meta["calibration"])
+        for frame in iter_session(session_path):
+            if frame["left"] is None or frame["right"] is None:
+                print(f"Could not read frame {frame['index']} of {session_path}, skipping.")
+                continue
+            grayL, grayR = stereo.rectify_gray(rect, frame["left"], frame["right"])
+            frames.append({"grayL": grayL, "grayR": grayR, "lidar_cm": frame["lidar_cm"], "rect": rect})
+    return frames
+
+
+# === Recorder ===
+def record(path, frames, interval, resolution):
+    import serial
+    from picamera2 import Picamera2
+
+    cameras = [Picamera2(0), Picamera2(1)]
+    for camera in cameras:
+        camera.configure(camera.create_preview_configuration(main={"size": resolution}))
+        camera.start()
+    ser = serial.Serial("/dev/ttyAMA0", 115200)
+    time.sleep(2)  # Give sensors time to stabilize
+
+    writer = SessionWriter(path, resolution)
+    try:
+        for _ in range(frames):
+            imgL = cameras[0].capture_array()
+            imgR = cameras[1].capture_array()
+            lidar_cm = None
+            if ser.in_waiting > 8:
+                frame = ser.read(9)
+                ser.reset_input_buffer()
+                if frame[0] == 0x59 and frame[1] == 0x59:
+                    lidar_cm = frame[2] + frame[3] * 256
+            writer.add(imgL, imgR, lidar_cm)
+            print(f"Recorded frame {writer.count} (LiDAR {lidar_cm} cm)")
+            time.sleep(interval)
+    finally:
+        writer.close()
+        for camera in cameras:
+            camera.stop()
+        ser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record a stereo + LiDAR session")
+    parser.add_argument("path", help="output directory, e.g. sessions/street_01")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between frames")
+    parser.add_argument("--resolution", default="640x480")
+    args = parser.parse_args()
+    os.makedirs(args.path, exist_ok=True)
+    record(args.path, args.frames, args.interval, tuple(int(v) for v in args.resolution.split("x")))
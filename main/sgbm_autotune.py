@@ -0,0 +1,96 @@
+import argparse
+import itertools
+import json
+
+import cv2
+import numpy as np
+
+import preset_eval
+import profiles
+import sessions
+import stereo_engines
+
+# === SGBM autotuner ===
+# Sweeps StereoSGBM parameters over recorded sessions (see sessions.py) and picks the fastest
+# setting that still meets the distance-accuracy target against the TF-Luna and a minimum
+# disparity density. The pick is written to profiles.TUNED_PRESET_PATH, which profiles.py
+# loads at startup as the "tuned" preset.
+#
+#   python sgbm_autotune.py sessions/street_01 sessions/street_02 --max-error-cm 30 --profiles balanced
+
+GRID = {
+    "numDisparities": [16 * 3, 16 * 4, 16 * 5, 16 * 6, 16 * 7, 16 * 8],
+    "blockSize": [3, 5, 7],
+    "mode": [cv2.STEREO_SGBM_MODE_SGBM, cv2.STEREO_SGBM_MODE_SGBM_3WAY],
+    "speckleWindowSize": [50, 100],
+}
+MODE_NAMES = {cv2.STEREO_SGBM_MODE_SGBM: "SGBM", cv2.STEREO_SGBM_MODE_SGBM_3WAY: "3WAY"}
+
+
+def candidates(grid):
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, values))
+        # Smoothness penalties scale with the block area, as OpenCV recommends
+        params["P1"] = 8 * 3 * params["blockSize"] ** 2
+        params["P2"] = 32 * 3 * params["blockSize"] ** 2
+        yield params
+
+
+def describe(params):
+    return (f"nd={params['numDisparities']:3d} bs={params['blockSize']} "
+            f"{MODE_NAMES.get(params['mode'], params['mode']):4s} sw={params['speckleWindowSize']:3d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the fastest SGBM preset that meets an accuracy target")
+    parser.add_argument("sessions", nargs="+", help="recorded session directories")
+    parser.add_argument("--max-error-cm", type=float, default=30.0, help="mean distance error vs LiDAR")
+    parser.add_argument("--min-density", type=float, default=0.3, help="valid disparity fraction in the ROI")
+    parser.add_argument("--repeats", type=int, default=1, help="timing passes per candidate (best is kept)")
+    parser.add_argument("--profiles", default="", help="comma-separated profiles that should use the pick")
+    parser.add_argument("--output", default=profiles.TUNED_PRESET_PATH)
+    args = parser.parse_args()
+
+    cv2.setNumThreads(cv2.getNumberOfCPUs())
+    frames = sessions.load_rectified(args.sessions)
+    lidar_frames = sum(1 for f in frames if f["lidar_cm"] is not None)
+    print(f"Loaded {len(frames)} frames ({lidar_frames} with LiDAR) from {len(args.sessions)} sessions.")
+    if lidar_frames == 0:
+        print("Warning: no LiDAR readings, accuracy target cannot be checked; ranking on density only.")
+
+    results = []
+    for params in candidates(GRID):
+        engine = stereo_engines.SGBMEngine(params)
+        runs = [preset_eval.measure_stereo(engine, frames) for _ in range(args.repeats)]
+        metrics = min(runs, key=lambda m: m["latency_ms"])
+        results.append((params, metrics))
+        print(f"{describe(params)}  error {metrics['distance_mae_cm']:6.1f} cm  "
+              f"density {metrics['density']:.2f}  {metrics['latency_ms']:6.1f} ms")
+
+    def meets_target(metrics):
+        accurate = lidar_frames == 0 or metrics["distance_mae_cm"] <= args.max_error_cm
+        return accurate and metrics["density"] >= args.min_density
+
+    passing = [(p, m) for p, m in results if meets_target(m)]
+    if passing:
+        params, metrics = min(passing, key=lambda r: r[1]["latency_ms"])
+        print(f"\nFastest preset meeting the target: {describe(params)} ({metrics['latency_ms']:.1f} ms)")
+    else:
+        params, metrics = min(results, key=lambda r: np.nan_to_num(r[1]["distance_mae_cm"], nan=np.inf))
+        print(f"\nNo preset meets the target; using the most accurate: {describe(params)}")
+
+    tuned = {
+        "params": {k: int(v) for k, v in params.items()},
+        "metrics": metrics,
+        "target": {"max_error_cm": args.max_error_cm, "min_density": args.min_density},
+        "sessions": args.sessions,
+        "profiles": [p for p in args.profiles.split(",") if p],
+    }
+    with open(args.output, "w") as f:
+        json.dump(tuned, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+# === Small statistics shared by the benchmarks and the loop watchdog ===
+# Plain Python, so the tools that use it (ble_bench.py, loop_watchdog.py) do not need numpy.
+
+
+def percentile(values, pct):
+    """Nearest-rank `pct` percentile of `values` (a non-empty sequence)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
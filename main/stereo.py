@@ -0,0 +1,68 @@
+import os
+
+import cv2
+import numpy as np
+
+import calib_bundle
+
+# === Stereo rectification helpers ===
+CALIB_PATH = calib_bundle.CALIB_PATH
+VALID_DISP_MIN, VALID_DISP_MAX = 1, 128
+
+
+def load_rectification(size, calib_path=CALIB_PATH):
+    """Rectification products for `size` (see calib_bundle for the keys).
+
+    Loads the precomputed bundle written by calibration.py when there is one for the default
+    calibration, otherwise computes it from `calib_path`. A bundle that does not match the
+    current calibration (or bundle format) is rebuilt and saved over.
+    """
+    path = calib_bundle.bundle_path(size)
+    if calib_path != CALIB_PATH:
+        return calib_bundle.build_bundle(size, calib_path)
+    if os.path.isdir(path):
+        try:
+            return calib_bundle.load_bundle(path, size, calib_path)
+        except ValueError as e:
+            print(f"Refusing calibration bundle: {e}. Rebuilding it from {calib_path}.")
+    else:
+        print(f"No calibration bundle at {path}, computing rectification from {calib_path}.")
+    bundle = calib_bundle.build_bundle(size, calib_path)
+    calib_bundle.save_bundle(bundle, path)
+    return bundle
+
+
+def rectify_gray(rect, imgL, imgR):
+    rectL = cv2.remap(imgL, rect["mapL1"], rect["mapL2"], cv2.INTER_LINEAR)
+    rectR = cv2.remap(imgR, rect["mapR1"], rect["mapR2"], cv2.INTER_LINEAR)
+    if rectL.ndim == 3:
+        rectL = cv2.cvtColor(rectL, cv2.COLOR_BGR2GRAY)
+        rectR = cv2.cvtColor(rectR, cv2.COLOR_BGR2GRAY)
+    return rectL, rectR
+
+
+def rectify_into(rect, imgL, imgR, pool):
+    """Rectified colour left plus both rectified grays, written into buffers of a buffers.FramePool.
+
+    Only the right gray is needed, so the right image is converted before remapping (one channel
+    to interpolate instead of three).
+    """
+    h, w = imgL.shape[:2]
+    rectL = cv2.remap(imgL, rect["mapL1"], rect["mapL2"], cv2.INTER_LINEAR, dst=pool.get("rectL", imgL.shape))
+    grayL = cv2.cvtColor(rectL, cv2.COLOR_BGR2GRAY, dst=pool.get("grayL", (h, w)))
+    rawGrayR = cv2.cvtColor(imgR, cv2.COLOR_BGR2GRAY, dst=pool.get("rawGrayR", (h, w)))
+    grayR = cv2.remap(rawGrayR, rect["mapR1"], rect["mapR2"], cv2.INTER_LINEAR, dst=pool.get("grayR", (h, w)))
+    return rectL, grayL, grayR
+
+
+def disparity_to_cm(disparity, Q):
+    """Depth in cm for disparity values (scalar or array), as reprojectImageTo3D would give.
+
+    Only the Z row of Q is needed, so there is no reason to reproject a whole frame.
+    """
+    return Q[2, 3] / (Q[3, 2] * np.asarray(disparity, dtype=np.float64) + Q[3, 3]) * 100
+
+
+def cm_to_disparity(distance_cm, Q):
+    """Inverse of disparity_to_cm: the disparity at which a point `distance_cm` away appears."""
+    return (Q[2, 3] * 100 / np.asarray(distance_cm, dtype=np.float64) - Q[3, 3]) / Q[3, 2]
@@ -0,0 +1,196 @@
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+import buffers
+import profiles
+
+# === Stereo engines ===
+# Interchangeable matchers behind one interface. Every engine takes rectified 8-bit grayscale
+# images and returns float32 disparity in pixels at the input resolution, with invalid pixels
+# set to INVALID (below stereo.VALID_DISP_MIN), so downstream code never needs to know which
+# matcher produced it. The returned array is a buffer the engine fills again on the next call.
+
+INVALID = -1.0
+
+
+class StereoEngine(ABC):
+    name = "base"
+
+    # Full search range, used by depth.matcher_roi to cut the band the matcher cannot fill.
+    # All disparities here are in full-res pixels.
+    num_disparities = 0
+    block_size = 0
+    # Current search window, [min_disparity, min_disparity + search_disparities); see set_range
+    min_disparity = 0
+    search_disparities = 0
+
+    def __init__(self):
+        self.pool = buffers.FramePool()
+
+    @abstractmethod
+    def compute(self, grayL, grayR):
+        """Disparity for one rectified pair (see the module comment)."""
+
+    def set_range(self, min_disparity, num_disparities):
+        """Search only [min_disparity, min_disparity + num_disparities) on the next compute calls.
+
+        num_disparities must be a multiple of 16; engines working at reduced scale round their
+        own window outwards.
+        """
+        if (min_disparity, num_disparities) != (self.min_disparity, self.search_disparities):
+            self._apply_range(int(min_disparity), int(num_disparities))
+
+    def reset_range(self):
+        self.set_range(0, self.num_disparities)
+
+    @abstractmethod
+    def _apply_range(self, min_disparity, num_disparities):
+        """Reconfigure the matcher(s) for the window and record it in min/search_disparities."""
+
+
+def _to_pixels(raw, scale=1.0, min_disparity=0, out=None):
+    """Fixed-point (x16) matcher output to float32 pixels, marking unmatched pixels INVALID.
+
+    OpenCV marks unmatched pixels with (minDisparity - 1) * 16, so `min_disparity` is in the
+    matcher's own (possibly downscaled) pixels. Written into `out` when given.
+    """
+    disparity = np.multiply(raw, 1.0 / (16.0 * scale), out=out, dtype=np.float32)
+    disparity[raw < min_disparity * 16] = INVALID
+    return disparity
+
+
+def _downscale(pool, img, scale, name):
+    size = (int(round(img.shape[1] * scale)), int(round(img.shape[0] * scale)))
+    return cv2.resize(img, size, dst=pool.get(name, (size[1], size[0]), img.dtype), interpolation=cv2.INTER_AREA)
+
+
+def _round_up_16(n):
+    return max(16, int(np.ceil(n / 16.0)) * 16)
+
+
+class SGBMEngine(StereoEngine):
+    """The original full-resolution StereoSGBM."""
+    name = "sgbm"
+
+    def __init__(self, sgbm_preset):
+        super().__init__()
+        self.matcher = profiles.create_sgbm(sgbm_preset)
+        self.num_disparities = self.search_disparities = self.matcher.getNumDisparities()
+        self.block_size = self.matcher.getBlockSize()
+
+    def _apply_range(self, min_disparity, num_disparities):
+        self.matcher.setMinDisparity(min_disparity)
+        self.matcher.setNumDisparities(num_disparities)
+        self.min_disparity, self.search_disparities = min_disparity, num_disparities
+
+    def compute(self, grayL, grayR):
+        raw = self.matcher.compute(grayL, grayR, self.pool.get("raw", grayL.shape, np.int16))
+        return _to_pixels(raw, min_disparity=self.min_disparity,
+                          out=self.pool.get("disparity", grayL.shape, np.float32))
+
+
+class BMEngine(StereoEngine):
+    """Block matching on downscaled images, upsampled back. Several times cheaper than SGBM."""
+    name = "bm-half"
+
+    def __init__(self, sgbm_preset, scale=0.5, block_size=9):
+        super().__init__()
+        params = profiles.SGBM_PRESETS[sgbm_preset] if isinstance(sgbm_preset, str) else sgbm_preset
+        self.scale = scale
+        self.matcher = cv2.StereoBM_create(numDisparities=_round_up_16(params["numDisparities"] * scale),
+                                           blockSize=block_size)
+        self.matcher.setUniquenessRatio(10)
+        self.matcher.setSpeckleWindowSize(params["speckleWindowSize"])
+        self.matcher.setSpeckleRange(2)
+        self.num_disparities = self.search_disparities = int(self.matcher.getNumDisparities() / scale)
+        self.block_size = int(block_size / scale)
+
+    def _apply_range(self, min_disparity, num_disparities):
+        small_min = int(min_disparity * self.scale)
+        small_num = _round_up_16(num_disparities * self.scale)
+        self.matcher.setMinDisparity(small_min)
+        self.matcher.setNumDisparities(small_num)
+        self.min_disparity, self.search_disparities = min_disparity, num_disparities
+
+    def compute(self, grayL, grayR):
+        size = (grayL.shape[1], grayL.shape[0])
+        smallL = _downscale(self.pool, grayL, self.scale, "smallL")
+        smallR = _downscale(self.pool, grayR, self.scale, "smallR")
+        raw = self.matcher.compute(smallL, smallR, self.pool.get("raw", smallL.shape, np.int16))
+        disparity = _to_pixels(raw, self.scale, self.matcher.getMinDisparity(),
+                               out=self.pool.get("small_disparity", smallL.shape, np.float32))
+        # Nearest keeps invalid pixels invalid instead of blending them into their neighbours
+        return cv2.resize(disparity, size, dst=self.pool.get("disparity", grayL.shape, np.float32),
+                          interpolation=cv2.INTER_NEAREST)
+
+
+class HalfResWLSEngine(StereoEngine):
+    """SGBM at half resolution, upsampled with an edge-aware WLS filter guided by the full-res left image.
+
+    The WLS filter needs opencv-contrib (cv2.ximgproc); without it the disparity is upsampled
+    bilinearly instead.
+    """
+    name = "sgbm-half-wls"
+    scale = 0.5
+
+    def __init__(self, sgbm_preset, wls_lambda=8000.0, wls_sigma=1.5):
+        super().__init__()
+        params = dict(profiles.SGBM_PRESETS[sgbm_preset] if isinstance(sgbm_preset, str) else sgbm_preset)
+        params["numDisparities"] = _round_up_16(params["numDisparities"] * self.scale)
+        self.left_matcher = profiles.create_sgbm(params)
+        self.num_disparities = self.search_disparities = int(params["numDisparities"] / self.scale)
+        self.block_size = int(params["blockSize"] / self.scale)
+        self.wls_lambda, self.wls_sigma = wls_lambda, wls_sigma
+
+        self.wls = None
+        if hasattr(cv2, "ximgproc"):
+            self._build_filter()
+        else:
+            print("cv2.ximgproc not available (install opencv-contrib-python); using bilinear upsampling.")
+
+    def _build_filter(self):
+        # The right matcher and the filter copy the left matcher's range when they are created
+        self.right_matcher = cv2.ximgproc.createRightMatcher(self.left_matcher)
+        self.wls = cv2.ximgproc.createDisparityWLSFilter(self.left_matcher)
+        self.wls.setLambda(self.wls_lambda)
+        self.wls.setSigmaColor(self.wls_sigma)
+
+    def _apply_range(self, min_disparity, num_disparities):
+        self.left_matcher.setMinDisparity(int(min_disparity * self.scale))
+        self.left_matcher.setNumDisparities(_round_up_16(num_disparities * self.scale))
+        if self.wls is not None:
+            self._build_filter()
+        self.min_disparity, self.search_disparities = min_disparity, num_disparities
+
+    def compute(self, grayL, grayR):
+        size = (grayL.shape[1], grayL.shape[0])
+        smallL = _downscale(self.pool, grayL, self.scale, "smallL")
+        smallR = _downscale(self.pool, grayR, self.scale, "smallR")
+        raw_left = self.left_matcher.compute(smallL, smallR, self.pool.get("raw_left", smallL.shape, np.int16))
+        small_min = self.left_matcher.getMinDisparity()
+        out = self.pool.get("disparity", grayL.shape, np.float32)
+        if self.wls is not None:
+            raw_right = self.right_matcher.compute(smallR, smallL,
+                                                   self.pool.get("raw_right", smallL.shape, np.int16))
+            # Given a half-size disparity and a full-size guide, the filter upsamples (and rescales
+            # the values) itself
+            filtered = self.wls.filter(raw_left, grayL, disparity_map_right=raw_right,
+                                       filtered_disparity_map=self.pool.get("filtered", grayL.shape, np.int16))
+            return _to_pixels(filtered, min_disparity=small_min / self.scale, out=out)
+        disparity = _to_pixels(raw_left, self.scale, small_min,
+                               out=self.pool.get("small_disparity", smallL.shape, np.float32))
+        upsampled = cv2.resize(disparity, size, dst=out, interpolation=cv2.INTER_LINEAR)
+        invalid = cv2.resize((raw_left < small_min * 16).astype(np.uint8), size, interpolation=cv2.INTER_NEAREST)
+        upsampled[invalid > 0] = INVALID
+        return upsampled
+
+
+ENGINES = {engine.name: engine for engine in (SGBMEngine, BMEngine, HalfResWLSEngine)}
+
+
+def make_engine(name, sgbm_preset):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown stereo engine {name!r}; choose from {', '.join(ENGINES)}")
+    return ENGINES[name](sgbm_preset)
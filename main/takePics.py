@@ -1,6 +1,12 @@
 from picamera2 import Picamera2, Preview
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import glob
+import queue
+import threading
 import time
 import cv2
+import numpy as np
 import os
 
 # Create output directories
@@ -9,46 +15,168 @@ right_dir = "right"
 os.makedirs(left_dir, exist_ok=True)
 os.makedirs(right_dir, exist_ok=True)
 
-# Initialize PiCamera2 instances for stereo cameras
-camera_left = Picamera2(0)
-camera_right = Picamera2(1)
+# Calibration board (must match calibration.py)
+board_size = (10, 7)
 
-# Configure both cameras
-config_left = camera_left.create_preview_configuration()
-config_right = camera_right.create_preview_configuration()
+# === Automatic capture settings ===
+PREVIEW_WIDTH = 320          # chessboard presence check runs on a downscaled preview
+MIN_SHARPNESS = 100.0        # variance of the Laplacian over the board, full resolution
+MIN_POSE_DISTANCE = 0.15     # how different a pose must be from every kept pose
 
-camera_left.configure(config_left)
-camera_right.configure(config_right)
 
-camera_left.start_preview(Preview.QTGL)
-camera_left.start()
-camera_right.start()
+def capture_pair(executor, camera_left, camera_right):
+    """Capture both cameras at the same time instead of one after the other."""
+    left = executor.submit(camera_left.capture_array)
+    right = executor.submit(camera_right.capture_array)
+    return left.result(), right.result()
 
-time.sleep(2)  # Give sensors time to stabilize
 
-print("Press enter to capture image pairs.")
-capture_count = 0
+def next_index():
+    existing = glob.glob(os.path.join(left_dir, "left_*.*"))
+    indices = [int(os.path.splitext(os.path.basename(p))[0].split("_")[1]) for p in existing]
+    return max(indices, default=-1) + 1
 
-try:
-    while True:
-        # Capture a preview frame from the left camera
-        img_left = camera_left.capture_array()
 
-        
+def save_pair(writer, index, img_left, img_right, ext):
+    left_path = os.path.join(left_dir, f"left_{index:02d}.{ext}")
+    right_path = os.path.join(right_dir, f"right_{index:02d}.{ext}")
+    writer.submit(cv2.imwrite, left_path, img_left)
+    writer.submit(cv2.imwrite, right_path, img_right)
+    print(f"Saved image pair #{index}: {left_path}, {right_path}")
 
-        input()
-        # Capture full-resolution images from both cameras
-        img_left_full = camera_left.capture_array()
-        img_right_full = camera_right.capture_array()
 
-        # Save images
-        left_path = os.path.join(left_dir, f"left_{capture_count:02d}.jpg")
-        right_path = os.path.join(right_dir, f"right_{capture_count:02d}.jpg")
-        cv2.imwrite(left_path, img_left_full)
-        cv2.imwrite(right_path, img_right_full)
-        print(f"Saved image pair #{capture_count}: {left_path}, {right_path}")
-        capture_count += 1
+def find_board_preview(img):
+    """Fast presence check on a downscaled grayscale copy. Returns corners in full-res pixels or None."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    scale = PREVIEW_WIDTH / gray.shape[1]
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    found, corners = cv2.findChessboardCorners(small, board_size, cv2.CALIB_CB_FAST_CHECK)
+    if not found:
+        return None, gray
+    return corners.reshape(-1, 2) / scale, gray
 
-finally:
-    camera_left.stop()
-    camera_right.stop()
+
+def board_sharpness(gray, corners):
+    x, y, w, h = cv2.boundingRect(corners.astype(np.float32))
+    region = gray[max(y, 0):y + h, max(x, 0):x + w]
+    return cv2.Laplacian(region, cv2.CV_64F).var() if region.size else 0.0
+
+
+def pose_descriptor(corners, shape):
+    """Board position, apparent size and in-plane tilt, normalised to the image."""
+    h, w = shape[:2]
+    centre = corners.mean(axis=0)
+    x, y, bw, bh = cv2.boundingRect(corners.astype(np.float32))
+    row = corners[board_size[0] - 1] - corners[0]
+    tilt = np.arctan2(row[1], row[0]) / np.pi
+    # Ratio of the two board edges changes with out-of-plane rotation
+    col = corners[-board_size[0]] - corners[0]
+    skew = np.linalg.norm(row) / max(np.linalg.norm(col), 1e-6) / (board_size[0] / board_size[1])
+    return np.array([centre[0] / w, centre[1] / h, np.sqrt(bw * bh / (w * h)), tilt, skew - 1])
+
+
+def auto_capture(camera_left, camera_right, target, ext):
+    """Capture informative pairs automatically until `target` pairs are kept or Ctrl+C."""
+    pairs = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    kept_poses = []
+    index = next_index()
+    kept = 0
+
+    def checker(writer):
+        nonlocal index, kept
+        while not stop.is_set():
+            try:
+                img_left, img_right = pairs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            corners_left, gray_left = find_board_preview(img_left)
+            if corners_left is None:
+                continue
+            corners_right, gray_right = find_board_preview(img_right)
+            if corners_right is None:
+                continue
+            sharpness = min(board_sharpness(gray_left, corners_left), board_sharpness(gray_right, corners_right))
+            if sharpness < MIN_SHARPNESS:
+                print(f"Board found but blurry ({sharpness:.0f}), skipping.")
+                continue
+            pose = pose_descriptor(corners_left, img_left.shape)
+            if kept_poses and min(np.linalg.norm(pose - p) for p in kept_poses) < MIN_POSE_DISTANCE:
+                continue
+            kept_poses.append(pose)
+            save_pair(writer, index, img_left, img_right, ext)
+            index += 1
+            kept += 1
+            if kept >= target:
+                stop.set()
+
+    print(f"Automatic capture: move the board around until {target} pairs are kept (Ctrl+C to stop).")
+    with ThreadPoolExecutor(max_workers=2) as grabber, ThreadPoolExecutor(max_workers=2) as writer:
+        thread = threading.Thread(target=checker, args=(writer,), daemon=True)
+        thread.start()
+        try:
+            while not stop.is_set():
+                pair = capture_pair(grabber, camera_left, camera_right)
+                # Only the newest pair matters; drop the one the checker has not picked up yet
+                try:
+                    pairs.get_nowait()
+                except queue.Empty:
+                    pass
+                pairs.put(pair)
+        finally:
+            stop.set()
+            thread.join()
+    print(f"Kept {kept} pairs.")
+
+
+def manual_capture(camera_left, camera_right, ext):
+    print("Press enter to capture image pairs.")
+    capture_count = next_index()
+    with ThreadPoolExecutor(max_workers=2) as grabber, ThreadPoolExecutor(max_workers=2) as writer:
+        while True:
+            input()
+            # Capture full-resolution images from both cameras
+            img_left_full, img_right_full = capture_pair(grabber, camera_left, camera_right)
+            save_pair(writer, capture_count, img_left_full, img_right_full, ext)
+            capture_count += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture stereo calibration pairs")
+    parser.add_argument("--manual", action="store_true", help="capture a pair each time enter is pressed")
+    parser.add_argument("--target", type=int, default=40, help="pairs to keep in automatic mode")
+    parser.add_argument("--format", choices=["png", "jpg"], default="png", help="png is lossless")
+    args = parser.parse_args()
+
+    # Initialize PiCamera2 instances for stereo cameras
+    camera_left = Picamera2(0)
+    camera_right = Picamera2(1)
+
+    # Configure both cameras
+    config_left = camera_left.create_preview_configuration()
+    config_right = camera_right.create_preview_configuration()
+
+    camera_left.configure(config_left)
+    camera_right.configure(config_right)
+
+    if args.manual:
+        camera_left.start_preview(Preview.QTGL)
+    camera_left.start()
+    camera_right.start()
+
+    time.sleep(2)  # Give sensors time to stabilize
+
+    try:
+        if args.manual:
+            manual_capture(camera_left, camera_right, args.format)
+        else:
+            auto_capture(camera_left, camera_right, args.target, args.format)
+    except KeyboardInterrupt:
+        print("\nStopping capture.")
+    finally:
+        camera_left.stop()
+        camera_right.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import math
+
+import hazards
+
+# Run from the repository root or main/:  python -m pytest main/test_hazards.py
+
+
+def person(distance_cm, bearing_deg=0.0, label="person"):
+    return {"label": label, "distance_cm": float(distance_cm), "direction": "ahead", "bearing_deg": bearing_deg}
+
+
+def feed(engine, distances, start=0.0, dt=0.1, label="person"):
+    """One detection per frame at `dt` spacing; returns the time of the last frame."""
+    now = start
+    for i, distance in enumerate(distances):
+        now = start + i * dt
+        engine.update([person(distance, label=label)], now)
+    return now
+
+
+def test_ttc_of_steady_approach():
+    engine = hazards.HazardEngine()
+    feed(engine, [600 - 100 * 0.1 * i for i in range(6)])     # 100 cm/s, ends at 550 cm
+    (track,) = engine.tracks
+    assert math.isclose(track.closing_cm_s, 100.0, rel_tol=1e-6)
+    assert math.isclose(track.ttc_s, 5.5, rel_tol=1e-6)
+
+
+def test_no_ttc_before_enough_history():
+    engine = hazards.HazardEngine(min_samples=3, min_span_s=0.3)
+    feed(engine, [600, 590, 580])       # three samples, but only 0.2 s of history
+    assert engine.tracks[0].ttc_s == math.inf
+
+
+def test_receding_and_static_objects_never_collide():
+    engine = hazards.HazardEngine()
+    feed(engine, [300 + 20 * i for i in range(10)])
+    assert engine.tracks[0].ttc_s == math.inf
+
+    engine = hazards.HazardEngine()
+    feed(engine, [400, 400, 400, 400, 400, 400])
+    assert engine.tracks[0].ttc_s == math.inf
+
+
+def test_noisy_static_object_is_gated_by_standard_error():
+    # +-40 cm of stereo noise around 400 cm: the fitted slope is not significant
+    engine = hazards.HazardEngine()
+    feed(engine, [440, 360, 430, 370, 420, 380, 410, 390, 400, 360])
+    track = engine.tracks[0]
+    assert track.ttc_s == math.inf
+    assert engine.level(track) == hazards.LEVEL_ROUTINE
+
+
+def test_crosswalks_get_no_ttc():
+    engine = hazards.HazardEngine()
+    feed(engine, [600 - 20 * i for i in range(10)], label="crosswalk")
+    assert engine.tracks[0].ttc_s == math.inf
+
+
+def test_levels_and_urgency():
+    engine = hazards.HazardEngine(imminent_ttc_s=2.0, warning_ttc_s=5.0)
+    feed(engine, [600 - 100 * 0.1 * i for i in range(6)])     # TTC 5.5 s
+    assert engine.level(engine.tracks[0]) == hazards.LEVEL_ROUTINE
+
+    engine = hazards.HazardEngine(imminent_ttc_s=2.0, warning_ttc_s=5.0)
+    feed(engine, [450 - 100 * 0.1 * i for i in range(6)])     # TTC 4 s
+    assert engine.level(engine.tracks[0]) == hazards.LEVEL_WARNING
+
+    engine = hazards.HazardEngine(imminent_ttc_s=2.0, warning_ttc_s=5.0)
+    detection = None
+    for i in range(6):
+        detection = person(250 - 100 * 0.1 * i)                 # TTC 2 s at the end
+        engine.update([detection], i * 0.1)
+    assert engine.level(engine.tracks[0]) == hazards.LEVEL_IMMINENT
+    assert detection["urgency"] == hazards.ble_protocol.URGENCY_IMMINENT
+
+
+def test_imminent_repeats_only_after_repeat_interval():
+    engine = hazards.HazardEngine(repeat_s=3.0)
+    dt, sent = 0.1, []
+    for i in range(50):                                          # 5 s closing at 30 cm/s from 150 cm
+        now = i * dt
+        engine.update([person(150 - 30 * now)], now)
+        announcement = engine.announcement(now)
+        if announcement is not None:
+            engine.mark_sent(announcement, now)
+            sent.append((round(now, 1), announcement.level))
+    imminent = [t for t, level in sent if level == hazards.LEVEL_IMMINENT]
+    # The routine report at t=0 must not delay the first alert: within 1 m and closing from ~1.7 s
+    assert sent[0] == (0.0, hazards.LEVEL_ROUTINE)
+    assert imminent[0] <= 1.8
+    assert len(imminent) >= 2
+    assert all(b - a >= 3.0 - 1e-9 for a, b in zip(imminent, imminent[1:]))
+
+
+def test_warning_is_sent_once_per_track():
+    engine = hazards.HazardEngine(warning_gap_s=0.0)
+    levels = []
+    for i in range(15):                                          # TTC 4 s, falling towards 3 s
+        now = i * 0.1
+        engine.update([person(600 - 150 * now)], now)
+        announcement = engine.announcement(now)
+        if announcement is not None:
+            engine.mark_sent(announcement, now)
+            levels.append(announcement.level)
+    assert levels.count(hazards.LEVEL_WARNING) == 1
+
+
+def test_routine_reports_wait_for_interval_and_distance_step():
+    engine = hazards.HazardEngine(report_interval_s=5.0, report_step_cm=100.0)
+
+    def step(now, distance):
+        engine.update([person(distance)], now)
+        announcement = engine.announcement(now)
+        if announcement is not None:
+            engine.mark_sent(announcement, now)
+        return announcement
+
+    assert step(0.0, 500).level == hazards.LEVEL_ROUTINE        # first sighting
+    assert step(6.0, 450) is None                               # interval passed, but only 50 cm closer
+    assert step(12.0, 390).level == hazards.LEVEL_ROUTINE       # 110 cm closer than the last report
+    assert step(13.0, 250) is None                              # closer, but within the interval
@@ -0,0 +1,73 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import ble_protocol
+import visualizers
+import viz_feed
+
+# === Debug viewer ===
+# Separate process that watches a running `main.py --viz-feed` through the shared-memory ring
+# in viz_feed.py. All drawing, colourisation and GUI work happens here; the detection process
+# only copies a downscaled frame into the ring while this viewer keeps its heartbeat fresh.
+#
+#   python viewer.py            # q to quit
+#
+# Reattaches when the runtime restarts (a new segment under the same name).
+
+STALE_AFTER_S = 5.0
+
+
+def attach(name):
+    while True:
+        try:
+            return viz_feed.FrameRing(name)
+        except FileNotFoundError:
+            print(f"Waiting for the feed '{name}' (is main.py running with --viz-feed?)...")
+            time.sleep(1.0)
+
+
+def render(frame, disparity, boxes):
+    objects, crosswalks = [], []
+    for x1, y1, x2, y2, conf, cls in boxes:
+        box = (int(x1), int(y1), int(x2), int(y2), float(conf))
+        if int(cls) == ble_protocol.CLASS_CROSSWALK:
+            crosswalks.append(box)
+        else:
+            objects.append(box + (ble_protocol.label_for(int(cls)),))
+    annotated = visualizers.annotate(frame, objects, crosswalks)
+    return np.hstack([annotated, visualizers.colorize_disparity(disparity)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the runtime's shared-memory debug feed")
+    parser.add_argument("--name", default=viz_feed.FEED_NAME)
+    parser.add_argument("--scale", type=float, default=2.0, help="window magnification")
+    args = parser.parse_args()
+
+    ring = attach(args.name)
+    last_seq, last_new = 0, time.time()
+    try:
+        while True:
+            ring.heartbeat()
+            latest = ring.read_latest(last_seq)
+            if latest is not None:
+                last_seq, frame, disparity, boxes = latest
+                last_new = time.time()
+                view = render(frame, disparity, boxes)
+                cv2.imshow("SafeStep", cv2.resize(view, None, fx=args.scale, fy=args.scale))
+            elif time.time() - last_new > STALE_AFTER_S:
+                ring.close()
+                ring = attach(args.name)
+                last_seq, last_new = 0, time.time()
+            if cv2.waitKey(30) & 0xFF == ord('q'):
+                break
+    finally:
+        ring.close()
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
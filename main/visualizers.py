@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import ble_protocol
+import buffers
+import detectors
+import viz_feed
+
+# === Visualisation back-ends ===
+# Chosen once at startup (see main.py) so the loop never pays for drawing it does not show:
+#   NullVisualizer      headless: no annotation, no colourisation, no GUI polling
+#   WindowVisualizer    --show: OpenCV windows, polled with waitKey
+#   SnapshotVisualizer  --snapshot-every N: headless, but every N seconds writes the annotated
+#                       frame, the colourised disparity and the detections to disk for field
+#                       diagnostics (written on a background thread)
+#   FeedVisualizer      --viz-feed: headless, but while viewer.py is attached publishes
+#                       decimated, downscaled frames to it through shared memory (viz_feed.py)
+#
+# The loop calls wants(now) and only renders when it returns True, and poll() once per frame
+# (False means the user asked to quit). render() runs in a worker thread and must not keep the
+# arrays it is given (they are pool buffers, refilled by the next frame); poll() runs on the
+# event loop and must be cheap. Drawing, colourisation and HighGUI calls happen on each
+# back-end's own thread (WindowVisualizer's GUI thread, SnapshotVisualizer's writer).
+
+
+def annotate(imgL, objects, crosswalks, out=None):
+    if out is None:
+        annotated = imgL.copy()
+    else:
+        annotated = out
+        np.copyto(annotated, imgL)
+    detectors.draw_objects(annotated, objects)
+    detectors.draw_crosswalks(annotated, crosswalks, color=(255, 255, 0))
+    return annotated
+
+
+def colorize_disparity(disparity, vis=None, out=None):
+    disp_vis = cv2.normalize(disparity, vis, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+    return cv2.applyColorMap(disp_vis, cv2.COLORMAP_JET, dst=out)
+
+
+def json_safe(value):
+    """`value` with non-finite floats (e.g. an infinite TTC) as None, so strict JSON readers accept it."""
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class NullVisualizer:
+    def wants(self, now):
+        return False
+
+    def render(self, imgL, disparity, objects, crosswalks, detected):
+        pass
+
+    def poll(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class WindowVisualizer(NullVisualizer):
+    """OpenCV windows, owned by one GUI thread (HighGUI wants every call from the same thread)."""
+
+    def __init__(self):
+        self.frames = queue.Queue(maxsize=1)
+        self.quit = threading.Event()
+        self.thread = threading.Thread(target=self._gui_loop, name="visualizer", daemon=True)
+        self.thread.start()
+
+    def wants(self, now):
+        return True
+
+    def render(self, imgL, disparity, objects, crosswalks, detected):
+        try:
+            self.frames.put_nowait((imgL.copy(), disparity.copy(), list(objects), list(crosswalks)))
+        except queue.Full:
+            pass    # the GUI thread is still drawing the last one
+
+    def _gui_loop(self):
+        pool = buffers.FramePool()
+        while not self.quit.is_set():
+            try:
+                imgL, disparity, objects, crosswalks = self.frames.get(timeout=0.03)
+                annotated = annotate(imgL, objects, crosswalks, out=pool.get("annotated", imgL.shape))
+                disp_color = colorize_disparity(disparity, pool.get("disp_vis", disparity.shape),
+                                                pool.get("disp_color", imgL.shape))
+                cv2.imshow("YOLO Detection", annotated)
+                cv2.imshow("Depth Map", disp_color)
+            except queue.Empty:
+                pass
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.quit.set()
+        cv2.destroyAllWindows()
+
+    def poll(self):
+        return not self.quit.is_set()
+
+    def close(self):
+        self.quit.set()
+        self.thread.join(timeout=2)
+
+
+class SnapshotVisualizer(NullVisualizer):
+    def __init__(self, directory="snapshots", interval_s=30.0, keep=200):
+        self.directory = directory
+        self.interval_s = interval_s
+        self.keep = keep
+        self.last = float("-inf")
+        os.makedirs(directory, exist_ok=True)
+        self.queue = queue.Queue(maxsize=2)
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def wants(self, now):
+        return now - self.last >= self.interval_s
+
+    def render(self, imgL, disparity, objects, crosswalks, detected):
+        # Copies, not pool buffers: the writer thread draws on them after the frame is over
+        self.last = time.time()
+        snapshot = (time.strftime("%Y%m%d-%H%M%S"), imgL.copy(), disparity.copy(), list(objects),
+                    list(crosswalks), detected)
+        try:
+            self.queue.put_nowait(snapshot)
+        except queue.Full:
+            pass    # the SD card is behind; drop this one rather than stall the loop
+
+    def _write_loop(self):
+        while True:
+            snapshot = self.queue.get()
+            if snapshot is None:
+                return
+            stamp, imgL, disparity, objects, crosswalks, detected = snapshot
+            base = os.path.join(self.directory, stamp)
+            cv2.imwrite(f"{base}_frame.jpg", annotate(imgL, objects, crosswalks, out=imgL))
+            cv2.imwrite(f"{base}_depth.jpg", colorize_disparity(disparity))
+            with open(f"{base}_detections.json", "w") as f:
+                json.dump(json_safe(detected), f, indent=1, allow_nan=False)
+            self._prune()
+
+    def _prune(self):
+        stamps = sorted({name.split("_")[0] for name in os.listdir(self.directory)})
+        for stamp in stamps[:-self.keep]:
+            for suffix in ("_frame.jpg", "_depth.jpg", "_detections.json"):
+                path = os.path.join(self.directory, stamp + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join(timeout=5)
+
+
+class FeedVisualizer(NullVisualizer):
+    def __init__(self, max_fps=5.0, size=viz_feed.FEED_SIZE):
+        self.ring = viz_feed.FrameRing(size=size, create=True)
+        self.period = 1.0 / max_fps
+        self.last = float("-inf")
+
+    def wants(self, now):
+        return now - self.last >= self.period and self.ring.viewer_attached(now)
+
+    def render(self, imgL, disparity, objects, crosswalks, detected):
+        # Drawing and colourisation happen in the viewer; here the frame is only copied out
+        self.last = time.time()
+        boxes = [(x1, y1, x2, y2, conf, ble_protocol.class_id(label)) for x1, y1, x2, y2, conf, label in objects]
+        boxes += [(x1, y1, x2, y2, conf, ble_protocol.CLASS_CROSSWALK) for x1, y1, x2, y2, conf in crosswalks]
+        self.ring.write(imgL, disparity, boxes)
+
+    def close(self):
+        self.ring.close(unlink=True)
+
+
+def make_visualizer(show=False, snapshot_every=None, snapshot_dir="snapshots", feed=False, feed_fps=5.0):
+    if show:
+        return WindowVisualizer()
+    if feed:
+        return FeedVisualizer(feed_fps)
+    if snapshot_every:
+        return SnapshotVisualizer(snapshot_dir, snapshot_every)
+    return NullVisualizer()
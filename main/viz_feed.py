@@ -0,0 +1,119 @@
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+# === Shared-memory debug feed ===
+# A small ring of downscaled frames that the detection process writes and viewer.py reads from
+# another process, so drawing and GUI work never run under the detection loop's GIL.
+#
+# Layout of the segment (see _layout): a float64 header, then per slot the sequence number it
+# holds, its box count, up to MAX_BOXES boxes (x1, y1, x2, y2, conf, class id from
+# ble_protocol) in feed pixels, the BGR frame and the float32 disparity. The viewer writes a
+# heartbeat into the header; the producer only writes (one resize into the slot, i.e. about a
+# memcpy) while that heartbeat is fresh.
+#
+# A slot's sequence number is cleared while it is written and set afterwards, so the reader can
+# tell when the slot it copied was overwritten underneath it.
+
+FEED_NAME = "safestep_viz"
+FEED_SIZE = (320, 240)      # (width, height)
+SLOTS = 4
+MAX_BOXES = 32
+VIEWER_TIMEOUT_S = 2.0
+
+HEADER_LEN = 8
+SEQ, HEARTBEAT, WIDTH, HEIGHT, SLOT_COUNT = range(5)
+
+
+def _layout(width, height, slots):
+    fields = [
+        ("header", (HEADER_LEN,), np.float64),
+        ("slot_seq", (slots,), np.int64),
+        ("box_count", (slots,), np.int64),
+        ("boxes", (slots, MAX_BOXES, 6), np.float32),
+        ("frames", (slots, height, width, 3), np.uint8),
+        ("disparity", (slots, height, width), np.float32),
+    ]
+    offset, layout = 0, {}
+    for name, shape, dtype in fields:
+        layout[name] = (offset, shape, dtype)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+class FrameRing:
+    def __init__(self, name=FEED_NAME, size=FEED_SIZE, slots=SLOTS, create=False):
+        if create:
+            try:
+                # Left behind by a producer that crashed
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            layout, nbytes = _layout(size[0], size[1], slots)
+            self.shm = shared_memory.SharedMemory(name, create=True, size=nbytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            # Before Python 3.13 attaching also registers the segment for cleanup, which would
+            # unlink the producer's segment when the viewer exits
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+            header = np.ndarray((HEADER_LEN,), np.float64, buffer=self.shm.buf)
+            size, slots = (int(header[WIDTH]), int(header[HEIGHT])), int(header[SLOT_COUNT])
+            layout, _ = _layout(size[0], size[1], slots)
+        self.size, self.slots = size, slots
+        for field, (offset, shape, dtype) in layout.items():
+            setattr(self, field, np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset))
+        if create:
+            self.header[:] = 0
+            self.header[WIDTH], self.header[HEIGHT], self.header[SLOT_COUNT] = size[0], size[1], slots
+            self.slot_seq[:] = -1
+
+    # --- producer ---
+    def viewer_attached(self, now=None):
+        return (time.time() if now is None else now) - self.header[HEARTBEAT] < VIEWER_TIMEOUT_S
+
+    def write(self, img, disparity, boxes):
+        """Downscale `img` and `disparity` into the next slot; `boxes` are in `img` pixels."""
+        seq = int(self.header[SEQ]) + 1
+        k = seq % self.slots
+        self.slot_seq[k] = -1
+        w, h = self.size
+        cv2.resize(img, (w, h), dst=self.frames[k], interpolation=cv2.INTER_AREA)
+        cv2.resize(disparity, (w, h), dst=self.disparity[k], interpolation=cv2.INTER_NEAREST)
+        n = min(len(boxes), MAX_BOXES)
+        if n:
+            slot_boxes = self.boxes[k, :n]
+            slot_boxes[:] = boxes[:n]
+            slot_boxes[:, [0, 2]] *= w / img.shape[1]
+            slot_boxes[:, [1, 3]] *= h / img.shape[0]
+        self.box_count[k] = n
+        self.slot_seq[k] = seq
+        self.header[SEQ] = seq
+
+    # --- viewer ---
+    def heartbeat(self):
+        self.header[HEARTBEAT] = time.time()
+
+    def read_latest(self, last_seq=0):
+        """(seq, frame, disparity, boxes) copied out of the newest slot, or None if nothing new."""
+        seq = int(self.header[SEQ])
+        if seq == 0 or seq == last_seq:
+            return None
+        k = seq % self.slots
+        frame = self.frames[k].copy()
+        disparity = self.disparity[k].copy()
+        boxes = self.boxes[k, :int(self.box_count[k])].copy()
+        if self.slot_seq[k] != seq:
+            return None     # overwritten while we copied; the next call gets a newer one
+        return seq, frame, disparity, boxes
+
+    def close(self, unlink=False):
+        # Drop our views before closing, or the buffer is still exported
+        for field in ("header", "slot_seq", "box_count", "boxes", "frames", "disparity"):
+            setattr(self, field, None)
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()